@@ -15,46 +15,9 @@ from components.feedback import (
     render_star_rating,
     render_thumbs_feedback,
 )
+from utils.config import get_config
 from utils.datadog_rum import init_datadog_rum
 
-
-def get_config(key: str, default: str = "") -> str:
-    """
-    Get configuration from environment or secrets, with graceful fallback.
-
-    Priority:
-    1. Environment variable (Cloud Run, Docker Compose)
-    2. Streamlit secrets.toml (local development, optional)
-    3. Default value
-
-    Args:
-        key: Configuration key name
-        default: Default value if not found
-
-    Returns:
-        Configuration value
-    """
-    # First try environment variable (preferred)
-    env_value = os.getenv(key)
-    if env_value:
-        return env_value
-
-    # Then try secrets.toml (for local development only)
-    # Use hasattr to check if secrets is available before accessing
-    if hasattr(st, "secrets") and st.secrets:
-        try:
-            # Check if secrets file exists and has content
-            secrets_dict = dict(st.secrets)
-            if key in secrets_dict:
-                return secrets_dict[key]
-        except Exception:
-            # No secrets file or error accessing it (normal for Docker/Cloud Run)
-            pass
-
-    # Return default if nothing found
-    return default
-
-
 # Configuration - prioritize environment variable over secrets
 API_BASE_URL = get_config("API_BASE_URL", "http://localhost:8000")
 API_KEY = get_config("API_KEY", "")
@@ -81,20 +44,18 @@ def display_multi_report_summary(data_list):
     st.info(f"📄 Extracted {len(data_list)} reports")
 
     with st.expander("📊 All Reports Summary", expanded=True):
-        summary_data = []
-        for idx, report in enumerate(data_list):
-            form_info = report.get("form_info", {})
-            vote_count = len(report.get("vote_results", []))
-            summary_data.append(
-                {
-                    "Report": f"#{idx + 1}",
-                    "District": form_info.get("district", "N/A"),
-                    "Station": form_info.get("polling_station_number", "N/A"),
-                    "Candidates/Parties": vote_count,
-                    "Form Type": form_info.get("form_type", "N/A"),
-                }
-            )
-        st.dataframe(summary_data)
+        # Assemble columns directly rather than one dict per row
+        form_infos = [report.get("form_info", {}) for report in data_list]
+        summary_df = pd.DataFrame(
+            {
+                "Report": [f"#{idx + 1}" for idx in range(len(data_list))],
+                "District": [fi.get("district", "N/A") for fi in form_infos],
+                "Station": [fi.get("polling_station_number", "N/A") for fi in form_infos],
+                "Candidates/Parties": [len(report.get("vote_results", [])) for report in data_list],
+                "Form Type": [fi.get("form_type", "N/A") for fi in form_infos],
+            }
+        )
+        st.dataframe(summary_df)
 
 
 def select_report_to_display(data_list):
@@ -203,8 +164,9 @@ def display_vote_results_tab(tab, data):
             display_row["vote_count_text"] = r.get("vote_count_text", "")
             display_results.append(display_row)
 
-        # Display table
-        st.dataframe(display_results)
+        # Build the frame once for both the table and the CSV download
+        df = pd.DataFrame(display_results)
+        st.dataframe(df)
 
         # Summary statistics
         total_votes = sum(r["vote_count"] for r in vote_results)
@@ -215,7 +177,6 @@ def display_vote_results_tab(tab, data):
             st.metric("Total Candidates/Parties", len(vote_results))
 
         # Download as CSV
-        df = pd.DataFrame(display_results)
         csv = df.to_csv(index=False, encoding="utf-8-sig")  # utf-8-sig for Thai characters
         st.download_button(
             label="📥 Download as CSV",
@@ -18,6 +18,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List
 
+import orjson
 import requests
 import streamlit as st
 from PIL import Image
@@ -142,8 +143,7 @@ def group_images_by_form() -> Dict[str, List[Path]]:
 
 def load_dataset(file_path: Path) -> Dict[str, Any]:
     """Load dataset from JSON file."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return orjson.loads(file_path.read_bytes())
 
 
 def save_dataset(dataset: Dict[str, Any], filename: str = None) -> Path:
@@ -774,7 +774,7 @@ elif operation == "📁 Load Existing Dataset":
     if uploaded_file is not None:
         try:
             # Read and parse the uploaded JSON
-            dataset_content = json.loads(uploaded_file.read())
+            dataset_content = orjson.loads(uploaded_file.read())
 
             # Validate basic structure
             if "metadata" not in dataset_content or "records" not in dataset_content:
@@ -809,7 +809,7 @@ elif operation == "📁 Load Existing Dataset":
                     f"📊 Records: {len(dataset_content['records'])} | Pages: {sum(r['input'].get('num_pages', 0) for r in dataset_content['records'])}"
                 )
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             st.error(f"❌ Invalid JSON file: {e}")
         except Exception as e:
             st.error(f"❌ Error loading file: {e}")
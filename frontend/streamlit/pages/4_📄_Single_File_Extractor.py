@@ -4,11 +4,13 @@ Query BigQuery for SS5/18 PDF files, select one, extract with Gemini,
 and view the PDF side-by-side with structured results.
 """
 
-import json
+import html
+import io
 import os
 import sys
 from datetime import datetime
 
+import orjson
 import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
@@ -21,6 +23,7 @@ from utils.gemini_extractor import (
     MODEL_OPTIONS,
     build_drive_preview_url,
     extract_from_drive,
+    extract_from_drive_uncached,
 )
 from utils.models import (
     ElectionFormData,
@@ -48,10 +51,76 @@ for key, default in {
     "sf_usage_metadata": None,
     "sf_selected_idx": 0,
     "sf_file_id": None,
+    "sf_extraction_timestamp": None,
+    "sf_download_payloads": None,
+    "sf_votes_cache": None,
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
+
+def _fmt_num_thai(val: int, thai: str) -> str:
+    """Format a number with its Thai text in parentheses, when present."""
+    return f"{val:,} ({thai})" if thai else f"{val:,}"
+
+
+@st.cache_data(show_spinner=False)
+def _validate_report(data_json: str) -> tuple[bool, list[str], list[str]]:
+    """Run extraction validation on a report, cached by its JSON form."""
+    return validate_extraction(orjson.loads(data_json))
+
+
+@st.cache_data(show_spinner=False)
+def _validate_pydantic(data_json: str) -> tuple[bool, str]:
+    """Validate a report against ElectionFormData, cached by its JSON form."""
+    try:
+        ElectionFormData.model_validate_json(data_json)
+        return True, ""
+    except Exception as e:
+        return False, str(e)
+
+
+def _build_votes_df(vote_results: list[dict], form_type: str) -> tuple[pd.DataFrame, int]:
+    """
+    Build the Votes table column by column so pandas constructs each one in bulk.
+
+    Returns:
+        Tuple of (votes_dataframe, calculated_total)
+    """
+    vote_counts = [v.get("vote_count") for v in vote_results]
+    votes = [get_number_value(vc) for vc in vote_counts]
+    columns = {
+        "#": [v.get("number") for v in vote_results],
+        "Votes": pd.array(votes, dtype="Int64"),
+        "Votes (Thai)": [get_thai_text(vc) for vc in vote_counts],
+    }
+    if form_type == "Constituency":
+        columns["Candidate"] = [v.get("candidate_name") or "-" for v in vote_results]
+    columns["Party"] = [v.get("party_name") or "-" for v in vote_results]
+    # get_number_value always returns an int, so the builtin sum needs no NA handling
+    return pd.DataFrame(columns), sum(votes)
+
+
+@st.cache_data(show_spinner=False)
+def _votes_csv(df_votes: pd.DataFrame) -> bytes:
+    """Encode the votes table as CSV, with a BOM so Excel reads Thai text."""
+    buffer = io.BytesIO()
+    df_votes.to_csv(buffer, index=False, encoding="utf-8-sig")
+    return buffer.getvalue()
+
+
+def _serialize_outputs(output_data: dict) -> tuple[bytes, bytes]:
+    """
+    Serialize the download payloads for an extraction.
+
+    Returns:
+        Tuple of (full_result_json, data_only_json) as UTF-8 bytes
+    """
+    full = orjson.dumps(output_data, option=orjson.OPT_INDENT_2)
+    data_only = orjson.dumps(output_data["extracted_data"], option=orjson.OPT_INDENT_2)
+    return full, data_only
+
+
 # --- Check required configuration ---
 config_ok = True
 if not GEMINI_API_KEY:
@@ -105,6 +174,12 @@ with st.sidebar:
             value=8192,
             step=512,
         )
+        reuse_upload = st.checkbox(
+            "Reuse uploaded PDF",
+            value=False,
+            help="Upload the PDF to Gemini once and reuse it when re-running "
+            "with other models or settings, instead of fetching it from Drive each time",
+        )
 
 # --- Page Header ---
 st.title("📄 Single File Extractor")
@@ -179,12 +254,15 @@ if search_button:
                 path_contains=path_filter.strip() or None,
                 min_size_kb=min_size_kb,
                 max_size_mb=max_size_mb,
+                order_by="path",
             )
             st.session_state.sf_search_results = results
             # Clear previous extraction when new search
             st.session_state.sf_extraction_result = None
             st.session_state.sf_usage_metadata = None
             st.session_state.sf_file_id = None
+            st.session_state.sf_extraction_timestamp = None
+            st.session_state.sf_download_payloads = None
 
             if results:
                 st.success(f"Found {len(results)} file(s)")
@@ -245,26 +323,51 @@ if st.session_state.sf_search_results:
         st.text(f"Full path: {selected_file['path']}")
         st.text(f"Full file ID: {selected_file['file_id']}")
 
-    # Extract button
-    extract_button = st.button(
-        "🚀 Extract Data",
-        type="primary",
-        use_container_width=True,
-    )
+    # Extract buttons
+    col_extract, col_rerun = st.columns([3, 1])
+    with col_extract:
+        extract_button = st.button(
+            "🚀 Extract Data",
+            type="primary",
+            use_container_width=True,
+        )
+    with col_rerun:
+        rerun_button = st.button(
+            "🔄 Re-run Extraction",
+            use_container_width=True,
+            help="Call Gemini again for this file instead of using the cached result",
+        )
 
-    if extract_button:
+    if extract_button or rerun_button:
+        # Re-runs bypass the shared cache rather than clearing it for every session
+        extract = extract_from_drive_uncached if rerun_button else extract_from_drive
         with st.spinner(f"Extracting with {model_name}..."):
             try:
-                result, usage = extract_from_drive(
+                result, usage = extract(
                     api_key=GEMINI_API_KEY,
                     file_id=selected_file["file_id"],
                     model=model_name,
                     temperature=temperature,
                     max_tokens=max_tokens,
+                    reuse_upload=reuse_upload,
                 )
                 st.session_state.sf_extraction_result = result
                 st.session_state.sf_usage_metadata = usage
                 st.session_state.sf_file_id = selected_file["file_id"]
+                st.session_state.sf_extraction_timestamp = datetime.now().isoformat()
+                # Serialize downloads now so result reruns only hand over bytes
+                st.session_state.sf_download_payloads = _serialize_outputs(
+                    {
+                        "source_file": selected_file,
+                        "extraction_metadata": {
+                            "model": usage.get("model", model_name),
+                            "timestamp": st.session_state.sf_extraction_timestamp,
+                            "reports_extracted": len(result),
+                        },
+                        "usage_metadata": usage,
+                        "extracted_data": result,
+                    }
+                )
                 st.success(f"Extracted {len(result)} report(s)")
             except Exception as e:
                 st.error(f"Extraction failed: {e}")
@@ -279,22 +382,17 @@ if st.session_state.sf_search_results:
                 with st.expander("Technical Details"):
                     st.exception(e)
 
+
 # =====================================================================
 # STEP 3: Results (side-by-side)
 # =====================================================================
-if st.session_state.sf_extraction_result is not None:
+@st.fragment
+def render_results():
+    """Render extraction results; view and report switches rerun only this fragment."""
     result = st.session_state.sf_extraction_result
     usage = st.session_state.sf_usage_metadata
     file_id = st.session_state.sf_file_id
 
-    # Find the selected file info
-    selected_file = None
-    if st.session_state.sf_search_results:
-        for f in st.session_state.sf_search_results:
-            if f["file_id"] == file_id:
-                selected_file = f
-                break
-
     st.markdown("---")
     st.subheader("📊 Step 3: Results")
 
@@ -303,8 +401,14 @@ if st.session_state.sf_extraction_result is not None:
 
     with col_pdf:
         st.markdown("#### 📄 PDF Preview")
-        preview_url = build_drive_preview_url(file_id)
-        components.iframe(preview_url, height=700, scrolling=True)
+        preview_url = html.escape(build_drive_preview_url(file_id), quote=True)
+        # Identical markup across reruns lets the frontend keep the mounted iframe,
+        # so Drive only re-fetches the preview when file_id changes.
+        components.html(
+            f'<iframe src="{preview_url}" width="100%" height="700" '
+            'style="border: 0;" loading="lazy" referrerpolicy="no-referrer"></iframe>',
+            height=720,
+        )
 
     with col_results:
         st.markdown("#### 📊 Extraction Results")
@@ -327,14 +431,21 @@ if st.session_state.sf_extraction_result is not None:
                 report_idx = 0
 
             data = result[report_idx]
-
-            # Tabs for result display
-            tab_summary, tab_votes, tab_validation, tab_usage, tab_json = st.tabs(
-                ["📋 Summary", "📊 Votes", "✅ Validation", "📈 Usage", "🔍 JSON"]
+            # Serialized once per rerun; doubles as the cache key for validation
+            data_json = orjson.dumps(data).decode()
+
+            # View selector for result display. Unlike st.tabs, only the selected
+            # view's body runs on each rerun.
+            view = st.radio(
+                "View",
+                ["📋 Summary", "📊 Votes", "✅ Validation", "📈 Usage", "🔍 JSON"],
+                horizontal=True,
+                label_visibility="collapsed",
+                key="sf_result_view",
             )
 
             # --- Summary Tab ---
-            with tab_summary:
+            if view == "📋 Summary":
                 form_info = data.get("form_info", {})
                 st.markdown("**Form Information**")
 
@@ -364,15 +475,13 @@ if st.session_state.sf_extraction_result is not None:
                     present = voter_stats.get("present_voters")
                     with vc1:
                         if eligible:
-                            val = get_number_value(eligible)
-                            thai = get_thai_text(eligible)
-                            label = f"{val:,}" + (f" ({thai})" if thai else "")
+                            label = _fmt_num_thai(
+                                get_number_value(eligible), get_thai_text(eligible)
+                            )
                             st.metric("Eligible Voters", label)
                     with vc2:
                         if present:
-                            val = get_number_value(present)
-                            thai = get_thai_text(present)
-                            label = f"{val:,}" + (f" ({thai})" if thai else "")
+                            label = _fmt_num_thai(get_number_value(present), get_thai_text(present))
                             st.metric("Present Voters", label)
 
                 # Ballot statistics
@@ -410,11 +519,15 @@ if st.session_state.sf_extraction_result is not None:
                 officials = data.get("officials")
                 if officials:
                     st.markdown(f"**Committee Members ({len(officials)})**")
-                    for off in officials[:10]:
-                        st.text(f"  {off.get('name', 'N/A')} - {off.get('position', 'N/A')}")
+                    st.text(
+                        "\n".join(
+                            f"  {off.get('name', 'N/A')} - {off.get('position', 'N/A')}"
+                            for off in officials[:10]
+                        )
+                    )
 
             # --- Vote Results Tab ---
-            with tab_votes:
+            elif view == "📊 Votes":
                 form_type = data.get("form_info", {}).get("form_type", "")
                 vote_results = data.get("vote_results", [])
 
@@ -423,32 +536,24 @@ if st.session_state.sf_extraction_result is not None:
                 else:
                     st.markdown(f"**{len(vote_results)} entries ({form_type})**")
 
-                    display_data = []
-                    for v in vote_results:
-                        vc_obj = v.get("vote_count")
-                        row = {
-                            "#": v.get("number"),
-                            "Votes": get_number_value(vc_obj),
-                            "Votes (Thai)": get_thai_text(vc_obj),
-                        }
-                        if form_type == "Constituency":
-                            row["Candidate"] = v.get("candidate_name") or "-"
-                        row["Party"] = v.get("party_name") or "-"
-                        display_data.append(row)
-
-                    df_votes = pd.DataFrame(display_data)
+                    # Reuse the table until the extraction or selected report changes
+                    votes_key = (file_id, st.session_state.sf_extraction_timestamp, report_idx)
+                    votes_cache = st.session_state.sf_votes_cache
+                    if votes_cache is None or votes_cache[0] != votes_key:
+                        votes_cache = (votes_key, *_build_votes_df(vote_results, form_type))
+                        st.session_state.sf_votes_cache = votes_cache
+                    _, df_votes, total_calc = votes_cache
                     st.dataframe(df_votes, use_container_width=True, hide_index=True)
 
                     # Totals
-                    total_calc = df_votes["Votes"].sum()
                     st.metric("Calculated Total", f"{total_calc:,}")
 
                     total_rec = data.get("total_votes_recorded")
                     if total_rec:
                         rec_val = get_number_value(total_rec)
-                        rec_thai = get_thai_text(total_rec)
-                        label = f"{rec_val:,}" + (f" ({rec_thai})" if rec_thai else "")
-                        st.metric("Recorded Total", label)
+                        st.metric(
+                            "Recorded Total", _fmt_num_thai(rec_val, get_thai_text(total_rec))
+                        )
                         if total_calc == rec_val:
                             st.success("Total validation passed")
                         else:
@@ -457,17 +562,16 @@ if st.session_state.sf_extraction_result is not None:
                             )
 
                     # CSV download
-                    csv = df_votes.to_csv(index=False, encoding="utf-8-sig")
                     st.download_button(
                         "📥 Download Votes CSV",
-                        data=csv,
+                        data=_votes_csv(df_votes),
                         file_name=f"votes_{file_id[:8]}.csv",
                         mime="text/csv",
                     )
 
             # --- Validation Tab ---
-            with tab_validation:
-                is_valid, val_errors, val_warnings = validate_extraction(data)
+            elif view == "✅ Validation":
+                is_valid, val_errors, val_warnings = _validate_report(data_json)
 
                 if is_valid and not val_warnings:
                     st.success("All validation checks passed!")
@@ -485,14 +589,14 @@ if st.session_state.sf_extraction_result is not None:
 
                 # Pydantic model validation
                 st.markdown("**Pydantic Model Validation**")
-                try:
-                    ElectionFormData(**data)
+                pydantic_ok, pydantic_error = _validate_pydantic(data_json)
+                if pydantic_ok:
                     st.success("Pydantic validation passed")
-                except Exception as e:
-                    st.error(f"Pydantic validation failed: {e}")
+                else:
+                    st.error(f"Pydantic validation failed: {pydantic_error}")
 
             # --- Usage Metadata Tab ---
-            with tab_usage:
+            elif view == "📈 Usage":
                 if usage:
                     st.markdown("**Token Usage**")
                     uc1, uc2, uc3 = st.columns(3)
@@ -530,46 +634,38 @@ if st.session_state.sf_extraction_result is not None:
                     st.info("No usage metadata available")
 
             # --- Raw JSON Tab ---
-            with tab_json:
-                st.json(data)
+            elif view == "🔍 JSON":
+                st.json(data_json)
 
         # --- Download full result ---
         st.markdown("---")
         st.markdown("#### 💾 Save Result")
 
-        output_data = {
-            "source_file": selected_file if selected_file else {"file_id": file_id},
-            "extraction_metadata": {
-                "model": usage.get("model") if usage else model_name,
-                "timestamp": datetime.now().isoformat(),
-                "reports_extracted": len(result),
-            },
-            "usage_metadata": usage,
-            "extracted_data": result,
-        }
-
-        json_str = json.dumps(output_data, indent=2, ensure_ascii=False)
+        json_bytes, data_only_bytes = st.session_state.sf_download_payloads
 
         col_dl1, col_dl2 = st.columns(2)
         with col_dl1:
             st.download_button(
                 "📥 Download Full Result (JSON)",
-                data=json_str,
+                data=json_bytes,
                 file_name=f"extracted_{file_id}.json",
                 mime="application/json",
                 use_container_width=True,
             )
         with col_dl2:
             # Download just the extracted data (for dataset use)
-            data_only = json.dumps(result, indent=2, ensure_ascii=False)
             st.download_button(
                 "📥 Download Data Only (JSON)",
-                data=data_only,
+                data=data_only_bytes,
                 file_name=f"data_{file_id}.json",
                 mime="application/json",
                 use_container_width=True,
             )
 
+
+if st.session_state.sf_extraction_result is not None:
+    render_results()
+
 # Footer
 st.markdown("---")
 st.markdown(
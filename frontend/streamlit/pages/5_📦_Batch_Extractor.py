@@ -3,12 +3,13 @@
 Filter by province and constituency path, then batch-extract with Gemini.
 """
 
-import json
+import io
+import operator
 import os
 import sys
-import time
 from datetime import datetime
 
+import orjson
 import pandas as pd
 import streamlit as st
 
@@ -16,13 +17,22 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from utils.bigquery_client import query_pdf_files
 from utils.config import get_config
 from utils.datadog_rum import init_datadog_rum
-from utils.gemini_extractor import MODEL_OPTIONS, extract_from_drive
+from utils.gemini_extractor import (
+    MODEL_OPTIONS,
+    extract_from_drive_batch,
+)
 from utils.models import get_number_value, validate_extraction
 
 # Configuration
 GEMINI_API_KEY = get_config("GEMINI_API_KEY")
 GOOGLE_CLOUD_PROJECT = get_config("GOOGLE_CLOUD_PROJECT")
 
+# Number of files shown per page in Detailed Results
+DETAIL_PAGE_SIZE = 25
+
+# vote_results entries are dicts that may omit vote_count
+_get_vote_count = operator.methodcaller("get", "vote_count")
+
 st.set_page_config(
     page_title="Batch Extractor",
     page_icon="📦",
@@ -34,11 +44,121 @@ rum_enabled = init_datadog_rum()
 # Session state initialization
 for key, default in {
     "batch_search_results": None,
+    "batch_search_df": None,
     "batch_results": None,
+    "batch_stats": None,
+    "batch_summary_df": None,
+    "batch_details": None,
+    "batch_detail_page": 0,
+    "batch_downloads": None,
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
+
+def build_summary_df(results: list[dict]) -> pd.DataFrame:
+    """Build the per-file summary table for a finished batch with column operations."""
+    flat = pd.json_normalize(results).reindex(
+        columns=[
+            "file_info.path",
+            "file_info.province_name",
+            "file_info.size_kb",
+            "success",
+            "reports_count",
+            "validations",
+            "usage_metadata.total_token_count",
+            "error",
+        ]
+    )
+    success = flat["success"].eq(True)
+
+    # One row per report validation, summed back per file. map(na_action="ignore")
+    # rather than .str, which rejects the all-NaN column of an all-failed batch.
+    checked = flat["validations"].map(len, na_action="ignore")
+    valid = (
+        flat["validations"]
+        .explode()
+        .map(operator.itemgetter("is_valid"), na_action="ignore")
+        .eq(True)
+        .groupby(level=0)
+        .sum()
+    )
+    valid_label = (valid.astype(str) + "/" + checked.fillna(0).astype(int).astype(str)).where(
+        checked > 0, "N/A"
+    )
+
+    tokens = flat["usage_metadata.total_token_count"].where(success, 0).fillna(0)
+
+    df_summary = pd.DataFrame(
+        {
+            # rpartition's tail is the basename, or the whole value when there is no "/"
+            "File": flat["file_info.path"].fillna("Unknown").str.rpartition("/")[2],
+            "Province": flat["file_info.province_name"].fillna("N/A"),
+            "Size (KB)": flat["file_info.size_kb"].fillna(0),
+            "Status": success.map({True: "Success", False: "Failed"}),
+            "Reports": flat["reports_count"].fillna(0).astype(int),
+            "Valid": valid_label.where(success, "-"),
+            "Tokens": tokens.astype(int),
+        }
+    )
+    if not success.all():
+        df_summary["Error"] = flat["error"].fillna("").str[:50].where(~success)
+    return df_summary
+
+
+def build_details(results: list[dict], df_summary: pd.DataFrame) -> list[tuple[str, list[str]]]:
+    """
+    Precompute the Detailed Results expander content for a finished batch.
+
+    Filenames and statuses come from the summary table, so paths are split once.
+
+    Returns:
+        One (expander_label, report_summary_lines) tuple per result
+    """
+    details = []
+    for i, (r, filename, status) in enumerate(
+        zip(results, df_summary["File"], df_summary["Status"], strict=True), 1
+    ):
+        report_lines = []
+        for j, report in enumerate(r.get("data", []) if r.get("success") else [], 1):
+            form_info = report.get("form_info", {})
+            votes = report.get("vote_results", [])
+            total = sum(map(get_number_value, map(_get_vote_count, votes)))
+            report_lines.append(
+                f"**Report {j}:** "
+                f"{form_info.get('form_type', 'N/A')} | "
+                f"{form_info.get('district', 'N/A')} | "
+                f"Station {form_info.get('polling_station_number', 'N/A')} | "
+                f"{len(votes)} entries | Total: {total:,}"
+            )
+        details.append((f"#{i} {filename} [{status}]", report_lines))
+    return details
+
+
+def shift_detail_page(delta: int) -> None:
+    """Move the Detailed Results window; runs as a button callback before the rerun."""
+    st.session_state.batch_detail_page += delta
+
+
+def build_downloads(output_data: dict, df_summary: pd.DataFrame) -> dict[str, bytes]:
+    """
+    Serialize the batch download payloads.
+
+    Called once when a batch completes; the bytes live in session state until the
+    results are cleared, so reruns never re-serialize.
+
+    Returns:
+        Dict with "json" (full results) and "csv" (summary table) payloads
+    """
+    # Write the CSV straight into a byte buffer instead of building a str first
+    csv_buffer = io.BytesIO()
+    df_summary.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
+    return {
+        "json": orjson.dumps(output_data, option=orjson.OPT_INDENT_2),
+        "csv": csv_buffer.getvalue(),
+    }
+
+
 # --- Check required configuration ---
 config_ok = True
 if not GEMINI_API_KEY:
@@ -103,24 +223,25 @@ with st.sidebar:
             help="Delay between API calls to avoid rate limiting",
             key="batch_delay",
         )
-
-    # Show batch stats in sidebar when results exist
-    if st.session_state.batch_results:
-        results = st.session_state.batch_results
-        successful = sum(1 for r in results if r.get("success"))
-        failed = len(results) - successful
-        total_tokens = sum(
-            r.get("usage_metadata", {}).get("total_token_count", 0)
-            for r in results
-            if r.get("success")
+        concurrency = st.slider(
+            "Concurrent requests",
+            min_value=1,
+            max_value=10,
+            value=1,
+            help="Files sent to Gemini at once; the delay applies after each request",
+            key="batch_concurrency",
         )
 
+    # Show batch stats in sidebar when results exist
+    # Counters are recorded by the processing loop, so nothing is re-summed here
+    stats = st.session_state.batch_stats
+    if st.session_state.batch_results and stats:
         st.markdown("---")
         st.header("📊 Batch Stats")
-        st.metric("Total Files", len(results))
-        st.metric("Successful", successful)
-        st.metric("Failed", failed)
-        st.metric("Total Tokens", f"{total_tokens:,}")
+        st.metric("Total Files", stats["total"])
+        st.metric("Successful", stats["successful"])
+        st.metric("Failed", stats["failed"])
+        st.metric("Total Tokens", f"{stats['total_tokens']:,}")
 
 # --- Page Header ---
 st.title("📦 Batch Extractor")
@@ -225,9 +346,16 @@ if search_button:
                 path_contains=path_filter.strip() or None,
                 min_size_kb=min_size_kb,
                 max_size_mb=max_size_mb,
+                order_by="path",
             )
             st.session_state.batch_search_results = results
+            st.session_state.batch_search_df = pd.DataFrame(results)
             st.session_state.batch_results = None  # Clear previous batch results
+            st.session_state.batch_stats = None
+            st.session_state.batch_summary_df = None
+            st.session_state.batch_details = None
+            st.session_state.batch_detail_page = 0
+            st.session_state.batch_downloads = None
 
             if results:
                 st.success(f"Found {len(results)} file(s)")
@@ -253,17 +381,14 @@ if st.session_state.batch_search_results:
     st.markdown("---")
     st.subheader(f"📋 Step 2: Review Files ({len(files)} files)")
 
-    # Summary
-    if files:
-        provinces = set(f["province_name"] for f in files)
-        total_size_mb = sum(f["size_mb"] for f in files)
-        st.info(
-            f"**{len(files)}** files from **{len(provinces)}** province(s) | "
-            f"Total size: **{total_size_mb:.1f} MB**"
-        )
+    # Summary (reductions run on the DataFrame built once at search time)
+    df = st.session_state.batch_search_df
+    st.info(
+        f"**{len(files)}** files from **{df['province_name'].nunique()}** province(s) | "
+        f"Total size: **{df['size_mb'].sum():.1f} MB**"
+    )
 
     # Display file table
-    df = pd.DataFrame(files)
     st.dataframe(
         df[["province_name", "path", "size_kb", "file_id"]],
         use_container_width=True,
@@ -289,111 +414,135 @@ if st.session_state.batch_search_results:
         progress_bar = st.progress(0, text="Starting batch extraction...")
         status_container = st.empty()
 
-        all_results = []
-        successful = 0
-        failed = 0
-        total_tokens = 0
-
-        for i, file_info in enumerate(files):
-            filename = (
-                file_info["path"].split("/")[-1] if "/" in file_info["path"] else file_info["path"]
-            )
-            progress_bar.progress(
-                (i + 1) / total,
-                text=f"Processing {i + 1}/{total}: {filename}",
-            )
+        # Filled in file order as results arrive, in whatever order they finish
+        all_results = [None] * total
+        stats = {
+            "total": total,
+            "successful": 0,
+            "failed": 0,
+            "total_reports": 0,
+            "valid_reports": 0,
+            "total_tokens": 0,
+            "total_input": 0,
+            "total_output": 0,
+        }
 
+        def record_outcome(index, outcome):
+            """Record one file's outcome and update the progress display."""
+            file_info = files[index]
             try:
-                result, usage = extract_from_drive(
-                    api_key=GEMINI_API_KEY,
-                    file_id=file_info["file_id"],
-                    model=model_name,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                result, usage = outcome
 
                 # Validate each report
-                validations = []
-                for report in result:
-                    is_valid, errors, warnings = validate_extraction(report)
-                    validations.append(
-                        {
-                            "is_valid": is_valid,
-                            "errors": errors,
-                            "warnings": warnings,
-                        }
-                    )
-
-                all_results.append(
-                    {
-                        "file_info": file_info,
-                        "success": True,
-                        "data": result,
-                        "validations": validations,
-                        "usage_metadata": usage,
-                        "reports_count": len(result),
-                    }
-                )
-                successful += 1
-                total_tokens += usage.get("total_token_count", 0)
+                validations = [
+                    {"is_valid": is_valid, "errors": errors, "warnings": warnings}
+                    for is_valid, errors, warnings in map(validate_extraction, result)
+                ]
+
+                all_results[index] = {
+                    "file_info": file_info,
+                    "success": True,
+                    "data": result,
+                    "validations": validations,
+                    "usage_metadata": usage,
+                    "reports_count": len(result),
+                }
+                stats["successful"] += 1
+                stats["total_reports"] += len(result)
+                stats["valid_reports"] += sum(v["is_valid"] for v in validations)
+                stats["total_tokens"] += usage.get("total_token_count", 0)
+                stats["total_input"] += usage.get("prompt_token_count", 0)
+                stats["total_output"] += usage.get("candidates_token_count", 0)
 
             except Exception as e:
-                all_results.append(
-                    {
-                        "file_info": file_info,
-                        "success": False,
-                        "error": str(e),
-                        "error_type": type(e).__name__,
-                    }
-                )
-                failed += 1
-
-            # Update running status
+                all_results[index] = {
+                    "file_info": file_info,
+                    "success": False,
+                    "error": str(e),
+                    "error_type": type(e).__name__,
+                }
+                stats["failed"] += 1
+
+            completed = stats["successful"] + stats["failed"]
+            path = file_info["path"]
+            progress_bar.progress(
+                completed / total,
+                text=f"Processed {completed}/{total}: {path.rsplit('/', 1)[-1]}",
+            )
             status_container.markdown(
-                f"**Progress:** {i + 1}/{total} | "
-                f"**Success:** {successful} | **Failed:** {failed} | "
-                f"**Tokens:** {total_tokens:,}"
+                f"**Progress:** {completed}/{total} | "
+                f"**Success:** {stats['successful']} | **Failed:** {stats['failed']} | "
+                f"**Tokens:** {stats['total_tokens']:,}"
             )
 
-            # Delay between requests
-            if delay_seconds > 0 and i < total - 1:
-                time.sleep(delay_seconds)
+        # Cached files are reported first; the rest go out in one batch with
+        # `concurrency` in flight, and their results are cached for later runs
+        extract_from_drive_batch(
+            api_key=GEMINI_API_KEY,
+            file_ids=[f["file_id"] for f in files],
+            model=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            concurrency=concurrency,
+            delay_seconds=delay_seconds,
+            on_result=record_outcome,
+        )
 
         progress_bar.progress(1.0, text="Batch extraction complete!")
         st.session_state.batch_results = all_results
+        st.session_state.batch_stats = stats
+
+        # Serialize downloads once here rather than on every results rerun
+        output_data = {
+            "metadata": {
+                "model": model_name,
+                "timestamp": datetime.now().isoformat(),
+                "total_files": total,
+                "successful": stats["successful"],
+                "failed": stats["failed"],
+                "total_reports": stats["total_reports"],
+                "filters": {
+                    "province": province_filter.strip() or None,
+                    "path_contains": path_filter.strip() or None,
+                },
+            },
+            "usage_summary": {
+                "total_input_tokens": stats["total_input"],
+                "total_output_tokens": stats["total_output"],
+                "total_tokens": stats["total_tokens"],
+            },
+            "results": all_results,
+        }
+        df_summary = build_summary_df(all_results)
+        st.session_state.batch_summary_df = df_summary
+        st.session_state.batch_details = build_details(all_results, df_summary)
+        st.session_state.batch_detail_page = 0
+        st.session_state.batch_downloads = build_downloads(output_data, df_summary)
         st.rerun()
 
+
 # =====================================================================
 # STEP 4: Results
 # =====================================================================
-if st.session_state.batch_results:
+@st.fragment
+def render_batch_results():
+    """Render batch results; expanders and downloads rerun only this fragment."""
     results = st.session_state.batch_results
 
     st.markdown("---")
     st.subheader("📊 Results")
 
     # Summary metrics
-    successful = sum(1 for r in results if r.get("success"))
-    failed = len(results) - successful
-    total_reports = sum(r.get("reports_count", 0) for r in results if r.get("success"))
-    total_tokens = sum(
-        r.get("usage_metadata", {}).get("total_token_count", 0) for r in results if r.get("success")
-    )
-    total_input = sum(
-        r.get("usage_metadata", {}).get("prompt_token_count", 0)
-        for r in results
-        if r.get("success")
-    )
-    total_output = sum(
-        r.get("usage_metadata", {}).get("candidates_token_count", 0)
-        for r in results
-        if r.get("success")
-    )
-
-    # Validation stats
-    all_validations = [v for r in results if r.get("success") for v in r.get("validations", [])]
-    valid_count = sum(1 for v in all_validations if v.get("is_valid"))
-    invalid_count = len(all_validations) - valid_count
+    stats = st.session_state.batch_stats
+    successful = stats["successful"]
+    failed = stats["failed"]
+    total_reports = stats["total_reports"]
+    total_tokens = stats["total_tokens"]
+    total_input = stats["total_input"]
+    total_output = stats["total_output"]
+    valid_reports = stats["valid_reports"]
 
     mc1, mc2, mc3, mc4, mc5 = st.columns(5)
     with mc1:
@@ -407,7 +556,7 @@ if st.session_state.batch_results:
     with mc5:
         st.metric(
             "Valid Reports",
-            f"{valid_count}/{valid_count + invalid_count}" if all_validations else "N/A",
+            f"{valid_reports}/{total_reports}" if total_reports else "N/A",
         )
 
     # Token usage summary
@@ -423,62 +572,50 @@ if st.session_state.batch_results:
 
     # Results table
     st.markdown("**Per-File Results**")
-    summary_data = []
-    for r in results:
-        fi = r.get("file_info", {})
-        filename = fi.get("path", "Unknown")
-        if "/" in filename:
-            filename = filename.split("/")[-1]
-
-        row = {
-            "File": filename,
-            "Province": fi.get("province_name", "N/A"),
-            "Size (KB)": fi.get("size_kb", 0),
-            "Status": "Success" if r.get("success") else "Failed",
-            "Reports": r.get("reports_count", 0),
-        }
-
-        if r.get("success"):
-            vals = r.get("validations", [])
-            valid = sum(1 for v in vals if v.get("is_valid"))
-            row["Valid"] = f"{valid}/{len(vals)}" if vals else "N/A"
-            row["Tokens"] = r.get("usage_metadata", {}).get("total_token_count", 0)
-        else:
-            row["Valid"] = "-"
-            row["Tokens"] = 0
-            row["Error"] = r.get("error", "")[:50]
-
-        summary_data.append(row)
-
-    df_summary = pd.DataFrame(summary_data)
+    df_summary = st.session_state.batch_summary_df
     st.dataframe(df_summary, use_container_width=True, hide_index=True)
 
     # Expandable details per file
     st.markdown("**Detailed Results**")
-    for i, r in enumerate(results):
-        fi = r.get("file_info", {})
-        filename = (
-            fi.get("path", "Unknown").split("/")[-1]
-            if "/" in fi.get("path", "")
-            else fi.get("path", "Unknown")
-        )
-        status = "Success" if r.get("success") else "Failed"
+    page_count = -(-len(results) // DETAIL_PAGE_SIZE)
+    page = min(st.session_state.batch_detail_page, page_count - 1)
+    if page_count > 1:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button(
+                "◀ Prev",
+                disabled=page == 0,
+                on_click=shift_detail_page,
+                args=(-1,),
+                key="batch_detail_prev",
+            )
+        with col_page:
+            st.caption(f"Page {page + 1} of {page_count}")
+        with col_next:
+            st.button(
+                "Next ▶",
+                disabled=page >= page_count - 1,
+                on_click=shift_detail_page,
+                args=(1,),
+                key="batch_detail_next",
+            )
 
-        with st.expander(f"#{i + 1} {filename} [{status}]", expanded=False):
+    # Only the current window of files goes through the expander loop
+    start = page * DETAIL_PAGE_SIZE
+    end = start + DETAIL_PAGE_SIZE
+    for i, (r, (label, report_lines)) in enumerate(
+        zip(results[start:end], st.session_state.batch_details[start:end], strict=True), start
+    ):
+        with st.expander(label, expanded=False):
             if r.get("success"):
                 # Show extraction summary
-                for j, report in enumerate(r.get("data", [])):
-                    form_info = report.get("form_info", {})
-                    votes = report.get("vote_results", [])
-                    total = sum(get_number_value(v.get("vote_count")) for v in votes)
-
-                    st.markdown(
-                        f"**Report {j + 1}:** "
-                        f"{form_info.get('form_type', 'N/A')} | "
-                        f"{form_info.get('district', 'N/A')} | "
-                        f"Station {form_info.get('polling_station_number', 'N/A')} | "
-                        f"{len(votes)} entries | Total: {total:,}"
-                    )
+                for line in report_lines:
+                    st.markdown(line)
+
+                # Expander bodies run even when collapsed, so the per-report
+                # validation messages and raw JSON are only built on request
+                if not st.toggle("Show validation & raw JSON", key=f"batch_detail_{i}"):
+                    continue
 
                 # Validation
                 for j, v in enumerate(r.get("validations", [])):
@@ -500,44 +637,22 @@ if st.session_state.batch_results:
     st.markdown("---")
     st.markdown("#### 💾 Download Results")
 
-    # Build output data
-    output_data = {
-        "metadata": {
-            "model": model_name,
-            "timestamp": datetime.now().isoformat(),
-            "total_files": len(results),
-            "successful": successful,
-            "failed": failed,
-            "total_reports": total_reports,
-            "filters": {
-                "province": province_filter.strip() or None,
-                "path_contains": path_filter.strip() or None,
-            },
-        },
-        "usage_summary": {
-            "total_input_tokens": total_input,
-            "total_output_tokens": total_output,
-            "total_tokens": total_tokens,
-        },
-        "results": results,
-    }
+    downloads = st.session_state.batch_downloads
 
     col_dl1, col_dl2 = st.columns(2)
     with col_dl1:
-        json_str = json.dumps(output_data, indent=2, ensure_ascii=False)
         st.download_button(
             "📥 Download All Results (JSON)",
-            data=json_str,
+            data=downloads["json"],
             file_name=f"batch_results_{len(results)}files.json",
             mime="application/json",
             use_container_width=True,
         )
 
     with col_dl2:
-        csv_data = df_summary.to_csv(index=False, encoding="utf-8-sig")
         st.download_button(
             "📥 Download Summary (CSV)",
-            data=csv_data,
+            data=downloads["csv"],
             file_name=f"batch_summary_{len(results)}files.csv",
             mime="text/csv",
             use_container_width=True,
@@ -546,9 +661,19 @@ if st.session_state.batch_results:
     # Clear results button
     if st.button("🗑️ Clear Results", key="clear_batch"):
         st.session_state.batch_results = None
+        st.session_state.batch_stats = None
+        st.session_state.batch_summary_df = None
+        st.session_state.batch_details = None
+        st.session_state.batch_detail_page = 0
+        st.session_state.batch_downloads = None
         st.session_state.batch_search_results = None
+        st.session_state.batch_search_df = None
         st.rerun()
 
+
+if st.session_state.batch_results:
+    render_batch_results()
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -6,6 +6,22 @@ from google.cloud import bigquery
 # Default BigQuery table
 BQ_TABLE = "sourceinth.vote69_ect.raw_files"
 
+# Keys of each file metadata dict returned by query_pdf_files
+FILE_COLUMNS = [
+    "file_id",
+    "path",
+    "mime_type",
+    "folder_id",
+    "province_name",
+    "size",
+    "size_mb",
+    "size_kb",
+    "mod_time",
+]
+
+# Columns query_pdf_files accepts for order_by (interpolated, so keep this closed)
+SORTABLE_COLUMNS = ("path", "province_name", "size", "mod_time")
+
 
 @st.cache_resource
 def get_bq_client(project_id: str) -> bigquery.Client:
@@ -13,6 +29,7 @@ def get_bq_client(project_id: str) -> bigquery.Client:
     return bigquery.Client(project=project_id)
 
 
+@st.cache_data(ttl=300, show_spinner=False)
 def query_pdf_files(
     project_id: str,
     limit: int = 100,
@@ -20,10 +37,13 @@ def query_pdf_files(
     path_contains: str | None = None,
     min_size_kb: float = 50.0,
     max_size_mb: float = 50.0,
+    order_by: str | None = None,
 ) -> list[dict]:
     """
     Query BigQuery for PDF files from the raw_files table.
 
+    Results are cached for 5 minutes per filter combination.
+
     Args:
         project_id: GCP project ID
         limit: Maximum number of files to return
@@ -31,21 +51,33 @@ def query_pdf_files(
         path_contains: Filter by substring in path (e.g. "เขตเลือกตั้งที่ 1")
         min_size_kb: Minimum file size in KB
         max_size_mb: Maximum file size in MB
+        order_by: Column to sort by (one of SORTABLE_COLUMNS), or None
+            to skip the sort when the caller does not need a stable order
 
     Returns:
         List of file metadata dicts
+
+    Raises:
+        ValueError: If order_by is not a sortable column
     """
-    client = get_bq_client(project_id)
+    if order_by is not None and order_by not in SORTABLE_COLUMNS:
+        raise ValueError(f"Cannot order by {order_by!r}; expected one of {SORTABLE_COLUMNS}")
 
-    conditions = ["mime_type = 'application/pdf'"]
-    query_params = []
+    client = get_bq_client(project_id)
 
-    min_bytes = int(min_size_kb * 1024)
-    conditions.append(f"size >= {min_bytes}")
+    # All filter values are bound as parameters so the query text stays stable
+    # across filter changes and BigQuery can reuse cached results
+    conditions = ["mime_type = 'application/pdf'", "size >= @min_bytes"]
+    query_params = [
+        bigquery.ScalarQueryParameter("min_bytes", "INT64", int(min_size_kb * 1024)),
+        bigquery.ScalarQueryParameter("limit", "INT64", limit),
+    ]
 
     if max_size_mb:
-        max_bytes = int(max_size_mb * 1024 * 1024)
-        conditions.append(f"size <= {max_bytes}")
+        conditions.append("size <= @max_bytes")
+        query_params.append(
+            bigquery.ScalarQueryParameter("max_bytes", "INT64", int(max_size_mb * 1024 * 1024))
+        )
 
     if province:
         conditions.append("province_name = @province")
@@ -58,40 +90,34 @@ def query_pdf_files(
         )
 
     where_clause = " AND ".join(conditions)
+    order_clause = f"ORDER BY {order_by} ASC" if order_by else ""
 
     query = f"""
     SELECT file_id, path, mime_type, folder_id, province_name, size, mod_time
     FROM `{BQ_TABLE}`
     WHERE {where_clause}
-    ORDER BY path ASC
-    LIMIT {limit}
+    {order_clause}
+    LIMIT @limit
     """
 
-    job_config = bigquery.QueryJobConfig(query_parameters=query_params)
+    job_config = bigquery.QueryJobConfig(query_parameters=query_params, use_query_cache=True)
     query_job = client.query(query, job_config=job_config)
-    results = query_job.result()
-
-    files = []
-    for row in results:
-        files.append(
-            {
-                "file_id": row.file_id,
-                "path": row.path,
-                "mime_type": row.mime_type,
-                "folder_id": row.folder_id,
-                "province_name": row.province_name,
-                "size": row.size,
-                "size_mb": round(row.size / (1024 * 1024), 3) if row.size else 0,
-                "size_kb": round(row.size / 1024, 1) if row.size else 0,
-                "mod_time": str(row.mod_time) if row.mod_time else None,
-            }
-        )
+    df = query_job.result().to_dataframe(create_bqstorage_client=True)
+
+    # Derived size columns computed column-wise instead of per row
+    size = df["size"].astype("float64")
+    df["size_mb"] = (size / (1024 * 1024)).round(3).fillna(0)
+    df["size_kb"] = (size / 1024).round(1).fillna(0)
+    df["mod_time"] = df["mod_time"].map(str, na_action="ignore")
 
-    return files
+    # Back to plain Python values (None for nulls) so results stay JSON-serializable
+    df = df.astype(object).where(df.notna(), None)
+    return df[FILE_COLUMNS].to_dict("records")
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
 def get_distinct_provinces(project_id: str) -> list[str]:
-    """Query distinct province names for filtering."""
+    """Query distinct province names for filtering (cached for an hour)."""
     client = get_bq_client(project_id)
     query = f"""
     SELECT DISTINCT province_name
@@ -99,5 +125,6 @@ def get_distinct_provinces(project_id: str) -> list[str]:
     WHERE province_name IS NOT NULL
     ORDER BY province_name
     """
-    results = client.query(query).result()
-    return [row.province_name for row in results]
+    # Single-column result decoded through Arrow instead of per-row Row objects
+    table = client.query(query).result().to_arrow(create_bqstorage_client=True)
+    return table.column("province_name").to_pylist()
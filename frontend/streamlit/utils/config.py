@@ -1,10 +1,12 @@
 """Shared configuration utilities."""
 
+import functools
 import os
 
 import streamlit as st
 
 
+@functools.cache
 def get_config(key: str, default: str = "") -> str:
     """
     Get configuration from environment or secrets, with graceful fallback.
@@ -14,6 +16,9 @@ def get_config(key: str, default: str = "") -> str:
     2. Streamlit secrets.toml (local development, optional)
     3. Default value
 
+    Environment and secrets do not change within a process, so lookups are
+    memoized per (key, default).
+
     Args:
         key: Configuration key name
         default: Default value if not found
@@ -26,13 +31,12 @@ def get_config(key: str, default: str = "") -> str:
     if env_value:
         return env_value
 
-    # Then try secrets.toml (for local development only)
-    if hasattr(st, "secrets") and st.secrets:
-        try:
-            secrets_dict = dict(st.secrets)
-            if key in secrets_dict:
-                return secrets_dict[key]
-        except Exception:
-            pass
+    # Then try secrets.toml (for local development only); look up the single key
+    # rather than copying every secret into a dict
+    try:
+        value = st.secrets[key]
+    except Exception:
+        # No secrets file or key missing (normal for Docker/Cloud Run)
+        return default
 
-    return default
+    return value if value else default
@@ -1,49 +1,16 @@
 """API client for submitting user feedback to Datadog LLMObs."""
 
+import asyncio
+import atexit
 import logging
-import os
 from typing import Any, Dict, Literal, Optional
 
 import httpx
 import streamlit as st
 
-logger = logging.getLogger(__name__)
-
-
-def _get_config(key: str, default: str = "") -> str:
-    """
-    Get configuration from environment or secrets, with graceful fallback.
-
-    Priority:
-    1. Environment variable (Cloud Run, Docker Compose)
-    2. Streamlit secrets.toml (local development, optional)
-    3. Default value
-
-    Args:
-        key: Configuration key name
-        default: Default value if not found
-
-    Returns:
-        Configuration value
-    """
-    # First try environment variable (preferred)
-    env_value = os.getenv(key)
-    if env_value:
-        return env_value
+from utils.config import get_config
 
-    # Then try secrets.toml (for local development only)
-    if hasattr(st, "secrets") and st.secrets:
-        try:
-            # Check if secrets file exists and has content
-            secrets_dict = dict(st.secrets)
-            if key in secrets_dict:
-                return secrets_dict[key]
-        except Exception:
-            # No secrets file or error accessing it (normal for Docker/Cloud Run)
-            pass
-
-    # Return default if nothing found
-    return default
+logger = logging.getLogger(__name__)
 
 
 class FeedbackAPIClient:
@@ -59,6 +26,18 @@ class FeedbackAPIClient:
         self.api_base_url = api_base_url.rstrip("/")
         self.feedback_endpoint = f"{self.api_base_url}/api/v1/feedback/submit"
 
+        # API key is optional for the feedback endpoint; resolve it once
+        self._headers = {"Content-Type": "application/json"}
+        api_key = get_config("API_KEY", "")
+        if api_key:
+            self._headers["X-API-Key"] = api_key
+
+        # Pooled client reused across submissions (keep-alive). Callers run each
+        # submission on a fresh event loop, so a sync client is used and driven
+        # from a worker thread rather than an AsyncClient bound to one loop.
+        self._client = httpx.Client(timeout=10.0, limits=httpx.Limits(max_keepalive_connections=4))
+        atexit.register(self._client.close)
+
     async def submit_feedback(
         self,
         span_id: str,
@@ -114,17 +93,11 @@ class FeedbackAPIClient:
             payload["session_id"] = session_id
 
         try:
-            # Get API key from environment or secrets (optional for feedback endpoint)
-            api_key = _get_config("API_KEY", "")
-
-            headers = {"Content-Type": "application/json"}
-            if api_key:
-                headers["X-API-Key"] = api_key
-
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(self.feedback_endpoint, json=payload, headers=headers)
-                response.raise_for_status()
-                return response.json()
+            response = await asyncio.to_thread(
+                self._client.post, self.feedback_endpoint, json=payload, headers=self._headers
+            )
+            response.raise_for_status()
+            return response.json()
 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error submitting feedback: {e.response.status_code}")
@@ -136,12 +109,13 @@ class FeedbackAPIClient:
             raise
 
 
+@st.cache_resource
 def get_feedback_client() -> FeedbackAPIClient:
     """
-    Get a feedback API client instance.
+    Get a shared feedback API client instance.
 
     Returns:
         FeedbackAPIClient instance
     """
-    api_base_url = _get_config("API_BASE_URL", "http://localhost:8000")
+    api_base_url = get_config("API_BASE_URL", "http://localhost:8000")
     return FeedbackAPIClient(api_base_url)
@@ -1,10 +1,26 @@
-"""Gemini-based extraction from Google Drive PDFs."""
+"""Gemini-based extraction from Google Drive PDFs.
 
-import json
+google.genai is imported inside the functions that call Gemini, so pages and helpers
+that only need the schema, prompt or validation do not pay for loading the SDK.
+"""
+
+from __future__ import annotations
 
+import asyncio
+import contextvars
+import functools
+import io
+import operator
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import httpx
+import orjson
 import streamlit as st
-from google import genai
-from google.genai import types
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
 
 # Gemini structured output schema for election form data
 ELECTION_DATA_SCHEMA = {
@@ -193,71 +209,52 @@ ELECTION_DATA_SCHEMA = {
 }
 
 EXTRACTION_PROMPT = """
-You are an expert data entry assistant for Thai Election documents (Form S.S. 5/18).
-
-CRITICAL INSTRUCTIONS:
-
-1. **Analyze all pages** of this PDF document carefully.
-
-2. **Extract BOTH number formats** for all numerical values:
-   - Arabic numerals (e.g., 120)
-   - Thai text (e.g., "หนึ่งร้อยยี่สิบ")
-   This applies to: voter statistics, ballot statistics, vote counts, and total votes.
-
-3. **Header Information** (usually on first page):
-   - Form type: "Constituency" (แบบแบ่งเขต) or "PartyList" (บัญชีรายชื่อ)
-   - Set number (ชุดที่) if present
-   - Date, Province, District, Sub-district
-   - Polling station number (หน่วยเลือกตั้งที่)
-   - Village number (หมู่ที่) if present
-
-4. **Section 1 - Voter Statistics:**
-   - 1.1 Eligible voters (ผู้มีสิทธิเลือกตั้งตามบัญชี)
-   - 1.2 Present voters (ผู้มาแสดงตน)
-   Extract both arabic and thai_text for each.
-
-5. **Section 2 - Ballot Statistics:**
-   - 2.1 Allocated ballots (บัตรที่ได้รับจัดสรร)
-   - 2.2 Used ballots (บัตรที่ใช้)
-   - 2.2.1 Valid ballots (บัตรดี)
-   - 2.2.2 Invalid ballots (บัตรเสีย)
-   - 2.2.3 No vote ballots (ไม่เลือก)
-   - 2.3 Remaining ballots (บัตรเหลือ)
-   Extract both arabic and thai_text for each.
-
-6. **Section 3 - Vote Results Table:**
-   - Consolidate all pages (table often spans multiple pages)
-   - For each entry: number, candidate name (if Constituency), party name, vote count
-   - Extract vote_count as {arabic: int, thai_text: str}
-
-7. **Total Votes Recorded:**
-   - Look for "รวม" (total) at the bottom of the vote results table
-   - Extract both arabic and thai_text
-
-8. **Officials (Committee Members):**
-   - Extract names and positions from signature section
-   - Common positions: ประธาน (Chair), กรรมการ (Member), เลขานุการ (Secretary)
-
-9. **Validation:**
-   - ballots_used.arabic = good_ballots.arabic + bad_ballots.arabic + no_vote_ballots.arabic
-   - total_votes_recorded.arabic = sum of all vote_count.arabic
+Extract the Thai election form(s) S.S. 5/18 in this PDF into the response schema.
+Read all pages; return one report per form.
+
+- Every number: both `arabic` (int) and `thai_text` as written (120 / "หนึ่งร้อยยี่สิบ").
+- form_type: Constituency (แบบแบ่งเขต) or PartyList (บัญชีรายชื่อ). ชุดที่ = set_number,
+  หน่วยเลือกตั้งที่ = polling_station_number, หมู่ที่ = village_moo.
+- voter_statistics: 1.1 ผู้มีสิทธิเลือกตั้งตามบัญชี = eligible_voters, 1.2 ผู้มาแสดงตน = present_voters.
+- ballot_statistics: 2.1 บัตรที่ได้รับจัดสรร = ballots_allocated, 2.2 บัตรที่ใช้ = ballots_used,
+  2.2.1 บัตรดี = good_ballots, 2.2.2 บัตรเสีย = bad_ballots, 2.2.3 ไม่เลือก = no_vote_ballots,
+  2.3 บัตรเหลือ = ballots_remaining.
+- vote_results: every candidate/party row, consolidated across pages; candidate_name only on
+  Constituency forms.
+- total_votes_recorded: the รวม row below the vote table.
+- officials: signature section (ประธาน, กรรมการ, เลขานุการ).
+- Check: ballots_used = good + bad + no_vote; total_votes_recorded = sum of vote_count (arabic).
 """
 
 # Available model options
-MODEL_OPTIONS = [
+MODEL_OPTIONS = (
     "gemini-2.5-flash",
     "gemini-2.5-flash-lite-preview-06-17",
     "gemini-3-flash-preview",
     "gemini-2.5-pro-preview-06-05",
     "gemini-1.5-flash",
     "gemini-1.5-pro",
-]
+)
+
+
+# Keep-alive pool for Gemini requests; limits are set on the transport, which
+# httpx uses in place of the client-level limits
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
 
 
 @st.cache_resource
 def get_gemini_client(api_key: str) -> genai.Client:
-    """Get cached Gemini client instance."""
-    return genai.Client(api_key=api_key, vertexai=False)
+    """Get cached Gemini client instance with a pooled, retrying HTTP transport."""
+    from google import genai
+    from google.genai import types
+
+    return genai.Client(
+        api_key=api_key,
+        vertexai=False,
+        http_options=types.HttpOptions(
+            client_args={"transport": httpx.HTTPTransport(retries=2, limits=_HTTP_LIMITS)}
+        ),
+    )
 
 
 def build_drive_uri(file_id: str) -> str:
@@ -270,12 +267,107 @@ def build_drive_preview_url(file_id: str) -> str:
     return f"https://drive.google.com/file/d/{file_id}/preview"
 
 
-def extract_from_drive(
+def fetch_drive_pdf(file_id: str) -> bytes:
+    """Download a link-shared Google Drive PDF."""
+    response = httpx.get(build_drive_uri(file_id), follow_redirects=True, timeout=60.0)
+    response.raise_for_status()
+    return response.content
+
+
+# Files API uploads expire after 48 hours, so cached handles are refreshed daily
+@st.cache_resource(ttl=24 * 3600, max_entries=64, show_spinner=False)
+def upload_drive_pdf(api_key: str, file_id: str) -> types.File:
+    """Upload a Drive PDF to the Gemini Files API once and reuse the handle."""
+    from google.genai import types
+
+    client = get_gemini_client(api_key)
+    return client.files.upload(
+        file=io.BytesIO(fetch_drive_pdf(file_id)),
+        config=types.UploadFileConfig(mime_type="application/pdf", display_name=file_id),
+    )
+
+
+def _file_part(api_key: str, file_id: str, reuse_upload: bool) -> types.Part:
+    """Reference a Drive PDF directly, or through its cached Files API upload."""
+    from google.genai import types
+
+    if reuse_upload:
+        uploaded = upload_drive_pdf(api_key, file_id)
+        return types.Part.from_uri(file_uri=uploaded.uri, mime_type="application/pdf")
+    return types.Part.from_uri(file_uri=build_drive_uri(file_id), mime_type="application/pdf")
+
+
+@functools.cache
+def _response_schema() -> types.Schema:
+    """ELECTION_DATA_SCHEMA parsed into the SDK's Schema model once, so requests skip
+    the dict conversion."""
+    from google.genai import types
+
+    return types.Schema.model_validate(ELECTION_DATA_SCHEMA)
+
+
+@functools.lru_cache(maxsize=32)
+def _generation_config(temperature: float, max_tokens: int) -> types.GenerateContentConfig:
+    """
+    Build the structured-output generation config for an extraction call.
+
+    Memoized per (temperature, max_tokens): the config is never mutated by the SDK,
+    so the default-settings path reuses a single instance for every request.
+    """
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=_response_schema(),
+        temperature=temperature,
+        max_output_tokens=max_tokens,
+        top_p=0.95,
+        top_k=40,
+    )
+
+
+# Token counts copied from the response's usage metadata
+_USAGE_COUNT_FIELDS = (
+    "prompt_token_count",
+    "candidates_token_count",
+    "cached_content_token_count",
+    "thoughts_token_count",
+    "total_token_count",
+)
+_get_usage_counts = operator.attrgetter(*_USAGE_COUNT_FIELDS)
+
+
+def _parse_response(
+    response: types.GenerateContentResponse, model: str, temperature: float, max_tokens: int
+) -> tuple[list[dict], dict]:
+    """Decode the extracted reports and usage metadata from a Gemini response."""
+    result = orjson.loads(response.text)
+
+    # Build usage metadata dict
+    usage_metadata = {"model": model}
+    if hasattr(response, "usage_metadata") and response.usage_metadata:
+        # Counts are Optional on the SDK model, so unset ones become 0
+        counts = _get_usage_counts(response.usage_metadata)
+        usage_metadata.update(
+            zip(_USAGE_COUNT_FIELDS, (count or 0 for count in counts), strict=True)
+        )
+    usage_metadata["generation_config"] = {
+        "temperature": temperature,
+        "max_output_tokens": max_tokens,
+        "top_p": 0.95,
+        "top_k": 40,
+    }
+
+    return result, usage_metadata
+
+
+def extract_from_drive_uncached(
     api_key: str,
     file_id: str,
     model: str = "gemini-2.5-flash",
     temperature: float = 0.0,
     max_tokens: int = 8192,
+    reuse_upload: bool = False,
 ) -> tuple[list[dict], dict]:
     """
     Extract vote data from a Google Drive PDF using Gemini.
@@ -286,6 +378,8 @@ def extract_from_drive(
         model: Gemini model name
         temperature: Sampling temperature
         max_tokens: Maximum output tokens
+        reuse_upload: Upload the PDF to the Gemini Files API once and reference
+            the upload on later calls, instead of Gemini fetching it from Drive
 
     Returns:
         Tuple of (extracted_data_list, usage_metadata_dict)
@@ -297,45 +391,193 @@ def extract_from_drive(
         raise ValueError("GEMINI_API_KEY is required")
 
     client = get_gemini_client(api_key)
-    drive_uri = build_drive_uri(file_id)
+    response = client.models.generate_content(
+        model=model,
+        contents=[_file_part(api_key, file_id, reuse_upload), EXTRACTION_PROMPT],
+        config=_generation_config(temperature, max_tokens),
+    )
+    return _parse_response(response, model, temperature, max_tokens)
 
-    file_part = types.Part.from_uri(file_uri=drive_uri, mime_type="application/pdf")
 
-    generation_config = types.GenerateContentConfig(
-        response_mime_type="application/json",
-        response_schema=ELECTION_DATA_SCHEMA,
+class _CacheMiss(Exception):
+    """Raised inside extract_from_drive when probing the cache finds no entry."""
+
+
+# What the next extract_from_drive body run should do instead of calling Gemini:
+# raise _CacheMiss (a lookup-only probe) or return a result the batch already fetched.
+# Errors are never cached, so a probe leaves no entry behind.
+_PROBE = object()
+_cache_fill: contextvars.ContextVar[object] = contextvars.ContextVar("_cache_fill", default=None)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def extract_from_drive(
+    api_key: str,
+    file_id: str,
+    model: str = "gemini-2.5-flash",
+    temperature: float = 0.0,
+    max_tokens: int = 8192,
+    reuse_upload: bool = False,
+) -> tuple[list[dict], dict]:
+    """
+    Cached extract_from_drive_uncached, shared across pages and sessions.
+
+    Repeat extractions of the same file with the same model settings reuse the
+    previous result instead of paying for another Gemini call. Failed calls are
+    not cached. Call extract_from_drive_uncached to force a fresh extraction;
+    clearing this cache would drop every session's results.
+
+    extract_from_drive_batch reads and fills this cache too. Streamlit keys entries
+    by keyword order, so callers pass every argument by keyword in signature order.
+    """
+    fill = _cache_fill.get()
+    if fill is _PROBE:
+        raise _CacheMiss
+    if fill is not None:
+        return fill
+    return extract_from_drive_uncached(
+        api_key=api_key,
+        file_id=file_id,
+        model=model,
         temperature=temperature,
-        max_output_tokens=max_tokens,
-        top_p=0.95,
-        top_k=40,
+        max_tokens=max_tokens,
+        reuse_upload=reuse_upload,
     )
 
-    response = client.models.generate_content(
+
+def _cached_extraction(
+    api_key: str, file_id: str, model: str, temperature: float, max_tokens: int, fill: object
+) -> tuple[list[dict], dict] | None:
+    """
+    Look up (fill=_PROBE) or store (fill=result) an extract_from_drive cache entry
+    without calling Gemini. Lookups return None on a miss.
+    """
+    token = _cache_fill.set(fill)
+    try:
+        return extract_from_drive(
+            api_key=api_key,
+            file_id=file_id,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            reuse_upload=False,
+        )
+    except _CacheMiss:
+        return None
+    finally:
+        _cache_fill.reset(token)
+
+
+async def _extract_one_async(
+    client: genai.Client,
+    file_id: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> tuple[list[dict], dict]:
+    """Extract a single file on the async client."""
+    from google.genai import types
+
+    file_part = types.Part.from_uri(file_uri=build_drive_uri(file_id), mime_type="application/pdf")
+    response = await client.aio.models.generate_content(
         model=model,
         contents=[file_part, EXTRACTION_PROMPT],
-        config=generation_config,
+        config=_generation_config(temperature, max_tokens),
     )
+    return _parse_response(response, model, temperature, max_tokens)
 
-    result = json.loads(response.text)
 
-    # Build usage metadata dict
-    usage_metadata = {"model": model}
-    if hasattr(response, "usage_metadata") and response.usage_metadata:
-        um = response.usage_metadata
-        usage_metadata.update(
-            {
-                "prompt_token_count": getattr(um, "prompt_token_count", 0) or 0,
-                "candidates_token_count": getattr(um, "candidates_token_count", 0) or 0,
-                "cached_content_token_count": getattr(um, "cached_content_token_count", 0) or 0,
-                "thoughts_token_count": getattr(um, "thoughts_token_count", 0) or 0,
-                "total_token_count": getattr(um, "total_token_count", 0) or 0,
-            }
-        )
-    usage_metadata["generation_config"] = {
-        "temperature": temperature,
-        "max_output_tokens": max_tokens,
-        "top_p": 0.95,
-        "top_k": 40,
-    }
+def extract_from_drive_batch(
+    api_key: str,
+    file_ids: list[str],
+    model: str = "gemini-2.5-flash",
+    temperature: float = 0.0,
+    max_tokens: int = 8192,
+    concurrency: int = 10,
+    delay_seconds: float = 0.0,
+    on_result: Callable[[int, tuple[list[dict], dict] | Exception], None] | None = None,
+) -> list[tuple[list[dict], dict] | Exception]:
+    """
+    Extract several Google Drive PDFs concurrently.
 
-    return result, usage_metadata
+    Files already in the extract_from_drive cache are served from it; only the
+    misses go to Gemini, with at most ``concurrency`` requests in flight at once,
+    and each new result is written back to the cache.
+
+    Args:
+        api_key: Gemini API key
+        file_ids: Google Drive file IDs
+        model: Gemini model name
+        temperature: Sampling temperature
+        max_tokens: Maximum output tokens
+        concurrency: Maximum number of concurrent requests
+        delay_seconds: Pause after each request before its slot is reused, skipped
+            once no files are left waiting
+        on_result: Called with (index, outcome) as each file completes, on the
+            calling thread, e.g. to update progress
+
+    Returns:
+        One entry per file ID, in order: a (extracted_data_list, usage_metadata_dict)
+        tuple, or the exception raised for that file
+
+    Raises:
+        ValueError: If API key is missing
+    """
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY is required")
+
+    outcomes: list[tuple[list[dict], dict] | Exception | None] = [None] * len(file_ids)
+    misses = []
+    for index, file_id in enumerate(file_ids):
+        cached = _cached_extraction(api_key, file_id, model, temperature, max_tokens, _PROBE)
+        if cached is None:
+            misses.append(index)
+            continue
+        outcomes[index] = cached
+        if on_result is not None:
+            on_result(index, cached)
+
+    async def run() -> None:
+        # A dedicated client per event loop: the async connection pool of the cached
+        # client would be bound to whichever loop first used it.
+        from google import genai
+        from google.genai import types
+
+        transport = httpx.AsyncHTTPTransport(retries=2, limits=_HTTP_LIMITS)
+        client = genai.Client(
+            api_key=api_key,
+            vertexai=False,
+            http_options=types.HttpOptions(async_client_args={"transport": transport}),
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+        waiting = len(misses)
+
+        async def extract_one(index: int) -> None:
+            nonlocal waiting
+            file_id = file_ids[index]
+            async with semaphore:
+                waiting -= 1
+                try:
+                    outcome = await _extract_one_async(
+                        client, file_id, model, temperature, max_tokens
+                    )
+                except Exception as e:
+                    outcome = e
+                else:
+                    _cached_extraction(api_key, file_id, model, temperature, max_tokens, outcome)
+                outcomes[index] = outcome
+                if on_result is not None:
+                    on_result(index, outcome)
+                # Hold the slot a little longer to space out requests for rate limiting
+                if delay_seconds > 0 and waiting:
+                    await asyncio.sleep(delay_seconds)
+
+        try:
+            await asyncio.gather(*(extract_one(index) for index in misses))
+        finally:
+            # Close the pooled connections with the loop that opened them
+            await transport.aclose()
+
+    if misses:
+        asyncio.run(run())
+    return outcomes
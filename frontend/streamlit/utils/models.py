@@ -2,17 +2,23 @@
 
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
-class NumberTextPair(BaseModel):
+class _FormModel(BaseModel):
+    """Base for the form models: parsed results are read-only."""
+
+    model_config = ConfigDict(frozen=True)
+
+
+class NumberTextPair(_FormModel):
     """Thai document number representation (both Arabic numeral and Thai text)."""
 
     arabic: int = Field(..., description="Arabic numeral (e.g., 120)")
     thai_text: Optional[str] = Field(None, description="Thai text (e.g., 'หนึ่งร้อยยี่สิบ')")
 
 
-class FormInfo(BaseModel):
+class FormInfo(_FormModel):
     """Header information identifying the polling station."""
 
     form_type: Optional[str] = Field(None, description="Constituency or PartyList")
@@ -26,14 +32,14 @@ class FormInfo(BaseModel):
     village_moo: Optional[str] = Field(None, description="Village number (หมู่ที่)")
 
 
-class VoterStatistics(BaseModel):
+class VoterStatistics(_FormModel):
     """Voter statistics (Section 1)."""
 
     eligible_voters: Optional[NumberTextPair] = Field(None, description="Total eligible voters")
     present_voters: Optional[NumberTextPair] = Field(None, description="Voters who showed up")
 
 
-class BallotStatistics(BaseModel):
+class BallotStatistics(_FormModel):
     """Ballot accounting statistics (Section 2)."""
 
     ballots_allocated: Optional[NumberTextPair] = Field(None, description="Allocated ballots")
@@ -44,7 +50,7 @@ class BallotStatistics(BaseModel):
     ballots_remaining: Optional[NumberTextPair] = Field(None, description="Remaining ballots")
 
 
-class VoteResult(BaseModel):
+class VoteResult(_FormModel):
     """Individual vote result."""
 
     number: int = Field(..., description="Candidate/Party number")
@@ -53,14 +59,14 @@ class VoteResult(BaseModel):
     vote_count: NumberTextPair = Field(..., description="Vote count (number + text)")
 
 
-class Official(BaseModel):
+class Official(_FormModel):
     """Committee member/official."""
 
     name: str = Field(..., description="Full name of official")
     position: str = Field(..., description="Position/role (e.g., ประธาน, กรรมการ)")
 
 
-class ElectionFormData(BaseModel):
+class ElectionFormData(_FormModel):
     """Complete election form extraction result."""
 
     form_info: FormInfo
@@ -106,6 +112,7 @@ def validate_extraction(data: dict) -> tuple[bool, list[str], list[str]]:
 
     # 1. Ballot statistics validation
     ballot_stats = data.get("ballot_statistics")
+    used = 0
     if ballot_stats:
         used = get_number_value(ballot_stats.get("ballots_used"))
         good = get_number_value(ballot_stats.get("good_ballots"))
@@ -119,12 +126,20 @@ def validate_extraction(data: dict) -> tuple[bool, list[str], list[str]]:
                 f"good+bad+no_vote ({expected_total:,})"
             )
 
-    # 2. Total votes validation
+    # Sum the vote counts and collect negative entries in a single pass
     vote_results = data.get("vote_results", [])
-    total_recorded = data.get("total_votes_recorded")
+    calculated_total = 0
+    negative_errors = []
+    for i, result in enumerate(vote_results, 1):
+        vote_count = get_number_value(result.get("vote_count"))
+        calculated_total += vote_count
+        if vote_count < 0:
+            name = result.get("candidate_name") or result.get("party_name") or f"Entry #{i}"
+            negative_errors.append(f"Negative vote count for {name}: {vote_count}")
 
+    # 2. Total votes validation
+    total_recorded = data.get("total_votes_recorded")
     if vote_results and total_recorded:
-        calculated_total = sum(get_number_value(v.get("vote_count")) for v in vote_results)
         recorded_total = get_number_value(total_recorded)
 
         if calculated_total != recorded_total:
@@ -137,7 +152,6 @@ def validate_extraction(data: dict) -> tuple[bool, list[str], list[str]]:
     voter_stats = data.get("voter_statistics")
     if voter_stats and ballot_stats:
         present = get_number_value(voter_stats.get("present_voters"))
-        used = get_number_value(ballot_stats.get("ballots_used"))
 
         if present > 0 and used > 0:
             discrepancy = abs(present - used)
@@ -148,11 +162,7 @@ def validate_extraction(data: dict) -> tuple[bool, list[str], list[str]]:
                 )
 
     # 4. Vote count non-negative check
-    for i, result in enumerate(vote_results, 1):
-        vote_count = get_number_value(result.get("vote_count"))
-        if vote_count < 0:
-            name = result.get("candidate_name") or result.get("party_name") or f"Entry #{i}"
-            errors.append(f"Negative vote count for {name}: {vote_count}")
+    errors.extend(negative_errors)
 
     # 5. Check for empty vote results
     if not vote_results:
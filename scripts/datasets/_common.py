@@ -0,0 +1,51 @@
+"""Helpers shared by the dataset scripts.
+
+Usage:
+    from _common import scan_images_dir, write_dataset
+
+    images = scan_images_dir(IMAGES_DIR)
+    write_dataset(output_path, dataset, pretty=args.pretty)
+"""
+
+import functools
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import orjson
+
+
+@functools.lru_cache(maxsize=8)
+def scan_images_dir(images_dir: Path) -> Dict[str, Path]:
+    """
+    Snapshot a directory's files once, keyed by file name.
+
+    os.scandir reads each entry's type from the directory listing, so
+    discovery and existence checks share one listing instead of globbing
+    and stat-ing every file separately.
+    """
+    try:
+        with os.scandir(images_dir) as entries:
+            return {entry.name: images_dir / entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return {}
+
+
+def write_dataset(path: Path, dataset: Dict[str, Any], pretty: bool = False) -> None:
+    """
+    Write a {"metadata", "records"} dataset to a JSON file.
+
+    Compact output is serialized one record at a time so the whole document is
+    never held in memory as a single string; ``pretty`` indents it for review.
+    """
+    with open(path, "wb") as f:
+        if pretty:
+            f.write(orjson.dumps(dataset, option=orjson.OPT_INDENT_2))
+            f.write(b"\n")
+            return
+        f.write(b'{"metadata":' + orjson.dumps(dataset["metadata"]) + b',"records":[')
+        for i, record in enumerate(dataset["records"]):
+            if i:
+                f.write(b",")
+            f.write(orjson.dumps(record))
+        f.write(b"]}")
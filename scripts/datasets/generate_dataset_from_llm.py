@@ -6,20 +6,28 @@ This script:
 1. Discovers images for specified form sets
 2. Calls the vote extraction API for each form set
 3. Saves the extracted data as ground truth in a dataset JSON file
+
+Usage:
+    python generate_dataset_from_llm.py
+    python generate_dataset_from_llm.py --pretty
 """
 
+import argparse
 import asyncio
-import json
 import logging
 import os
 import sys
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List
 
 import httpx
+import orjson
 from dotenv import load_dotenv
 
+from _common import scan_images_dir, write_dataset
+
 # Add project root to path
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.append(str(PROJECT_ROOT))
@@ -32,6 +40,7 @@ IMAGES_DIR = PROJECT_ROOT / "assets" / "ss5-18-images"
 DATASET_DIR = PROJECT_ROOT / "datasets" / "vote-extraction"
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 API_KEY = os.getenv("API_KEY", "")
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
 
 # Logging
 logging.basicConfig(
@@ -51,29 +60,25 @@ def discover_images(form_pattern: str = None) -> Dict[str, List[Path]]:
     Returns:
         Dictionary mapping form set names to lists of image paths
     """
-    if not IMAGES_DIR.exists():
-        logger.error(f"Images directory not found: {IMAGES_DIR}")
+    images = scan_images_dir(IMAGES_DIR)
+    if not images:
+        logger.error(f"Images directory not found or empty: {IMAGES_DIR}")
         return {}
 
-    form_sets = {}
+    form_sets = defaultdict(list)
     
-    for img_path in sorted(IMAGES_DIR.glob("*.jpg")):
+    # Paths are sorted once up front, so each form set's pages stay in order
+    for img_path in sorted(p for name, p in images.items() if name.endswith(".jpg")):
         # Extract form set name (everything before _page)
-        name = img_path.stem.split("_page")[0]
+        name = img_path.stem.partition("_page")[0]
         
         # Filter by pattern if provided
         if form_pattern and form_pattern not in name:
             continue
             
-        if name not in form_sets:
-            form_sets[name] = []
         form_sets[name].append(img_path)
     
-    # Sort images within each form set
-    for name in form_sets:
-        form_sets[name].sort()
-    
-    return form_sets
+    return dict(form_sets)
 
 
 async def extract_from_api(
@@ -96,40 +101,33 @@ async def extract_from_api(
     if API_KEY:
         headers["X-API-Key"] = API_KEY
     
-    # Prepare files for upload
-    files = []
-    for img_path in image_paths:
-        files.append(
-            ("files", (img_path.name, open(img_path, "rb"), "image/jpeg"))
-        )
-    
     try:
+        # Read images in worker threads so disk I/O doesn't block the event loop;
+        # read_bytes closes each file as soon as it is read
+        contents = await asyncio.gather(
+            *(asyncio.to_thread(img_path.read_bytes) for img_path in image_paths)
+        )
+        files = [
+            ("files", (img_path.name, content, "image/jpeg"))
+            for img_path, content in zip(image_paths, contents)
+        ]
+        
         async with httpx.AsyncClient(timeout=timeout) as client:
             logger.info(f"Calling API: {url} with {len(files)} images")
             response = await client.post(url, files=files, headers=headers)
             
-            # Close file handles
-            for _, (_, f, _) in files:
-                f.close()
-            
             if response.status_code != 200:
                 logger.error(
                     f"API error {response.status_code}: {response.text}"
                 )
                 return None
             
-            result = response.json()
+            result = orjson.loads(response.content)
             logger.info(f"✅ Extraction successful: {result.get('reports_extracted', 0)} reports")
             return result
             
     except Exception as e:
         logger.error(f"Failed to call API: {e}")
-        # Close file handles on error
-        for _, (_, f, _) in files:
-            try:
-                f.close()
-            except:
-                pass
         return None
 
 
@@ -179,6 +177,7 @@ async def generate_dataset(
     form_names: List[str],
     dataset_name: str = "vote-extraction-llm-generated",
     version: str = "v1",
+    max_concurrent: int = MAX_CONCURRENT_REQUESTS,
 ) -> Dict[str, Any]:
     """
     Generate a dataset by extracting data from specified form sets.
@@ -187,6 +186,7 @@ async def generate_dataset(
         form_names: List of form set names to process
         dataset_name: Name of the dataset
         version: Dataset version
+        max_concurrent: Maximum number of extraction requests in flight
         
     Returns:
         Complete dataset structure
@@ -198,9 +198,10 @@ async def generate_dataset(
     logger.info(f"📸 Discovered {len(all_form_sets)} form sets")
     
     # Filter to requested forms
+    wanted = set(form_names)
     form_sets_to_process = {
         name: paths for name, paths in all_form_sets.items()
-        if name in form_names
+        if name in wanted
     }
     
     if not form_sets_to_process:
@@ -224,19 +225,30 @@ async def generate_dataset(
         "records": [],
     }
     
-    # Process each form set
+    # Extract all form sets concurrently, with at most max_concurrent requests in flight
+    semaphore = asyncio.Semaphore(max_concurrent)
+    total = len(form_sets_to_process)
+    
+    async def extract(idx: int, form_name: str, image_paths: List[Path]):
+        async with semaphore:
+            logger.info(f"Processing [{idx}/{total}]: {form_name} ({len(image_paths)} pages)")
+            return await extract_from_api(image_paths)
+    
+    extraction_results = await asyncio.gather(
+        *(
+            extract(idx, form_name, image_paths)
+            for idx, (form_name, image_paths) in enumerate(form_sets_to_process.items(), 1)
+        )
+    )
+    
+    # Build records in form set order, all stamped with the batch completion time
     success_count = 0
     fail_count = 0
+    timestamp = datetime.now().isoformat()
     
-    for idx, (form_name, image_paths) in enumerate(form_sets_to_process.items(), 1):
-        logger.info(f"\n{'='*60}")
-        logger.info(f"Processing [{idx}/{len(form_sets_to_process)}]: {form_name}")
-        logger.info(f"Images: {len(image_paths)} pages")
-        logger.info(f"{'='*60}")
-        
-        # Extract data from API
-        extraction_result = await extract_from_api(image_paths)
-        
+    for (form_name, image_paths), extraction_result in zip(
+        form_sets_to_process.items(), extraction_results
+    ):
         if not extraction_result:
             logger.warning(f"⚠️ Failed to extract data for {form_name}")
             fail_count += 1
@@ -250,6 +262,12 @@ async def generate_dataset(
             fail_count += 1
             continue
         
+        # The first report is already stored as ground_truth, so keep the rest of
+        # the API response without duplicating it
+        api_response = {k: v for k, v in extraction_result.items() if k != "data"}
+        if len(extraction_result["data"]) > 1:
+            api_response["additional_reports"] = extraction_result["data"][1:]
+        
         # Create record
         record = {
             "id": form_name,
@@ -260,10 +278,10 @@ async def generate_dataset(
             },
             "ground_truth": ground_truth,
             "pages_processed": len(image_paths),
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
+            "created_at": timestamp,
+            "last_updated": timestamp,
             "extraction_metadata": {
-                "api_response": extraction_result,
+                "api_response": api_response,
                 "needs_review": True,
             },
         }
@@ -274,9 +292,6 @@ async def generate_dataset(
         
         success_count += 1
         logger.info(f"✅ Successfully processed {form_name}")
-        
-        # Small delay between requests to avoid overwhelming the API
-        await asyncio.sleep(1)
     
     # Final summary
     logger.info(f"\n{'='*60}")
@@ -290,13 +305,16 @@ async def generate_dataset(
     return dataset
 
 
-def save_dataset(dataset: Dict[str, Any], output_filename: str = None) -> Path:
+def save_dataset(
+    dataset: Dict[str, Any], output_filename: str = None, pretty: bool = False
+) -> Path:
     """
     Save dataset to JSON file.
     
     Args:
         dataset: Dataset structure
         output_filename: Optional custom filename
+        pretty: Indent the JSON for human review (default: compact)
         
     Returns:
         Path to saved file
@@ -312,8 +330,7 @@ def save_dataset(dataset: Dict[str, Any], output_filename: str = None) -> Path:
     output_path = DATASET_DIR / output_filename
     
     # Save to file
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(dataset, f, ensure_ascii=False, indent=2)
+    write_dataset(output_path, dataset, pretty=pretty)
     
     logger.info(f"\n💾 Dataset saved to: {output_path}")
     logger.info(f"📁 File size: {output_path.stat().st_size / 1024:.1f} KB")
@@ -323,6 +340,16 @@ def save_dataset(dataset: Dict[str, Any], output_filename: str = None) -> Path:
 
 async def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Generate a vote extraction dataset from the LLM API"
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the saved JSON for human review (default: compact)",
+    )
+    args = parser.parse_args()
+
     logger.info("🎯 Dataset Generation from LLM API")
     logger.info(f"API Base URL: {API_BASE_URL}")
     logger.info(f"Images Directory: {IMAGES_DIR}")
@@ -355,8 +382,8 @@ async def main():
         logger.error("❌ Failed to generate dataset")
         return 1
     
-    # Save dataset
-    output_path = save_dataset(dataset)
+    # Save dataset in a worker thread so file I/O doesn't block the event loop
+    output_path = await asyncio.to_thread(save_dataset, dataset, pretty=args.pretty)
     
     logger.info(f"\n{'='*60}")
     logger.info("✅ Dataset generation complete!")
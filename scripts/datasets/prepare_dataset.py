@@ -9,12 +9,14 @@ Usage:
     python prepare_dataset.py --help
     python prepare_dataset.py --local-only
     python prepare_dataset.py --push-to-datadog
+    python prepare_dataset.py --local-only --pretty
 """
 
 import argparse
-import json
 import os
 import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List
@@ -22,6 +24,9 @@ from typing import Any, Dict, List
 import requests
 from dotenv import load_dotenv
 from PIL import Image
+from urllib3.util.retry import Retry
+
+from _common import scan_images_dir, write_dataset
 
 # Add project root to path
 PROJECT_ROOT = Path(__file__).parent.parent.parent
@@ -31,6 +36,7 @@ sys.path.insert(0, str(PROJECT_ROOT))
 DATASET_NAME = "vote-extraction-thai-elections-v1"
 DATASET_DESCRIPTION = "Thai election forms from Bangkok districts (6-page sets)"
 PROJECT_NAME = "vote-extraction-project"
+UPLOAD_WORKERS = 8  # Concurrent record uploads to Datadog
 
 IMAGES_DIR = PROJECT_ROOT / "assets" / "ss5-18-images"
 DATASET_OUTPUT_DIR = PROJECT_ROOT / "datasets" / "vote-extraction"
@@ -70,28 +76,23 @@ class DatasetBuilder:
     def _discover_images(self) -> List[Path]:
         """Discover all image files."""
         images = sorted(
-            list(self.images_dir.glob("*.jpg")) + list(self.images_dir.glob("*.png"))
+            path
+            for name, path in scan_images_dir(self.images_dir).items()
+            if name.endswith((".jpg", ".png"))
         )
         print(f"✅ Found {len(images)} images in {self.images_dir}")
         return images
 
     def _group_by_form_set(self) -> Dict[str, List[Path]]:
         """Group images by form set (6 pages per set)."""
-        form_sets = {}
+        form_sets = defaultdict(list)
 
         for img_path in self.image_files:
             # Extract form set name
-            form_name = (
-                img_path.stem.rsplit("_page", 1)[0]
-                if "_page" in img_path.stem
-                else img_path.stem
-            )
+            head, sep, _ = img_path.stem.rpartition("_page")
+            form_sets[head if sep else img_path.stem].append(img_path)
 
-            if form_name not in form_sets:
-                form_sets[form_name] = []
-            form_sets[form_name].append(img_path)
-
-        return form_sets
+        return dict(form_sets)
 
     def build_records(self) -> List[Dict[str, Any]]:
         """Build dataset records."""
@@ -165,10 +166,10 @@ class DatasetValidator:
         if not input_data.get("image_paths"):
             errors.append("Missing or empty 'image_paths' in input")
         else:
-            # Check if files exist
+            # Check if files exist against the cached directory listing
             for img_path in input_data["image_paths"]:
                 full_path = PROJECT_ROOT / img_path
-                if not full_path.exists():
+                if full_path.name not in scan_images_dir(full_path.parent):
                     errors.append(f"Image file not found: {img_path}")
 
         # Validate expected output
@@ -234,9 +235,12 @@ class DatasetSaver:
 
     @staticmethod
     def save(
-        records: List[Dict[str, Any]], version: str = "v1", output_dir: Path = DATASET_OUTPUT_DIR
+        records: List[Dict[str, Any]],
+        version: str = "v1",
+        output_dir: Path = DATASET_OUTPUT_DIR,
+        pretty: bool = False,
     ) -> Path:
-        """Save dataset to local JSON file."""
+        """Save dataset to local JSON file (compact unless pretty is set)."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{DATASET_NAME}_{version}_{timestamp}.json"
         filepath = output_dir / filename
@@ -255,8 +259,7 @@ class DatasetSaver:
         }
 
         # Save to file
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(dataset, f, indent=2, ensure_ascii=False)
+        write_dataset(filepath, dataset, pretty=pretty)
 
         print(f"✅ Dataset saved to: {filepath}")
         print(f"   Size: {filepath.stat().st_size / 1024:.2f} KB")
@@ -286,11 +289,30 @@ class DatadogDatasetManager:
             "Content-Type": "application/json",
         }
 
+        # One keep-alive session for all API calls, with a pool sized for uploads.
+        # Rate-limited (429) requests are retried with backoff, honouring Retry-After.
+        # Connection and read errors are not retried: the POST may already have
+        # reached the server, and resending it would create a duplicate
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retries = Retry(
+            total=5,
+            connect=0,
+            read=0,
+            other=0,
+            status=5,
+            backoff_factor=0.5,
+            status_forcelist=[429],
+            allowed_methods=["GET", "POST"],
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=UPLOAD_WORKERS, max_retries=retries)
+        self.session.mount("https://", adapter)
+
     def get_or_create_project(self, name: str, description: str) -> str:
         """Get existing project ID or create new one."""
         # List projects
         url = f"{self.base_url}/projects"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()
 
         projects = response.json().get("data", [])
@@ -309,7 +331,7 @@ class DatadogDatasetManager:
             }
         }
 
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = self.session.post(url, json=payload)
         response.raise_for_status()
 
         project_id = response.json()["data"]["id"]
@@ -333,7 +355,7 @@ class DatadogDatasetManager:
             }
         }
 
-        response = requests.post(url, json=payload, headers=self.headers)
+        response = self.session.post(url, json=payload)
         response.raise_for_status()
 
         dataset_id = response.json()["data"]["id"]
@@ -343,12 +365,11 @@ class DatadogDatasetManager:
     def add_records(self, dataset_id: str, records: List[Dict[str, Any]]) -> int:
         """Add multiple records to a dataset."""
         url = f"{self.base_url}/datasets/{dataset_id}/records"
-        added = 0
 
         print(f"\n📤 Pushing {len(records)} records to Datadog...")
         print("=" * 80)
 
-        for i, record in enumerate(records, 1):
+        def add_record(i: int, record: Dict[str, Any]) -> bool:
             try:
                 payload = {
                     "data": {
@@ -360,14 +381,19 @@ class DatadogDatasetManager:
                     }
                 }
 
-                response = requests.post(url, json=payload, headers=self.headers)
+                response = self.session.post(url, json=payload)
                 response.raise_for_status()
 
                 print(f"✅ Added record {i}/{len(records)}: {record.get('id', i)}")
-                added += 1
+                return True
 
             except Exception as e:
                 print(f"❌ Failed to add record {i}: {e}")
+                return False
+
+        # Upload records concurrently over the shared session
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            added = sum(executor.map(add_record, range(1, len(records) + 1), records))
 
         print("=" * 80)
         print(f"✅ Successfully added {added}/{len(records)} records\n")
@@ -379,39 +405,35 @@ def print_statistics(records: List[Dict[str, Any]]):
     print("\n📊 Dataset Statistics")
     print("=" * 80)
 
+    # Accumulate every statistic in a single pass over the records
+    total_pages = total_votes = total_valid = total_invalid = 0
+    district_counts = Counter()
+    for r in records:
+        total_pages += r["input"]["num_pages"]
+        ballot_stats = r["expected_output"]["ballot_statistics"]
+        total_votes += ballot_stats["total_votes"]
+        total_valid += ballot_stats["valid_ballots"]
+        total_invalid += ballot_stats["invalid_ballots"]
+        if r["input"].get("district"):
+            district_counts[r["input"]["district"]] += 1
+
     total_records = len(records)
-    total_pages = sum(r["input"]["num_pages"] for r in records)
     avg_pages = total_pages / total_records if total_records > 0 else 0
 
     print(f"Total Records: {total_records}")
     print(f"Total Pages: {total_pages}")
     print(f"Avg Pages per Record: {avg_pages:.1f}")
 
-    # Vote statistics
-    total_votes = sum(
-        r["expected_output"]["ballot_statistics"]["total_votes"] for r in records
-    )
-    total_valid = sum(
-        r["expected_output"]["ballot_statistics"]["valid_ballots"] for r in records
-    )
-    total_invalid = sum(
-        r["expected_output"]["ballot_statistics"]["invalid_ballots"] for r in records
-    )
-
     print(f"\nBallot Statistics:")
     print(f"  Total Votes: {total_votes:,}")
     print(f"  Valid Ballots: {total_valid:,} ({total_valid/total_votes*100:.1f}%)")
     print(f"  Invalid Ballots: {total_invalid:,} ({total_invalid/total_votes*100:.1f}%)")
 
     # Districts
-    districts = set(
-        r["input"].get("district") for r in records if r["input"].get("district")
-    )
-    if districts:
+    if district_counts:
         print(f"\nGeographic Coverage:")
-        print(f"  Districts: {len(districts)}")
-        for district in sorted(districts):
-            count = sum(1 for r in records if r["input"].get("district") == district)
+        print(f"  Districts: {len(district_counts)}")
+        for district, count in sorted(district_counts.items()):
             print(f"    - {district}: {count} forms")
 
     print("=" * 80 + "\n")
@@ -434,6 +456,11 @@ def main():
     parser.add_argument(
         "--version", default="v1", help="Dataset version (default: v1)"
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the saved JSON for human review (default: compact)",
+    )
     args = parser.parse_args()
 
     print("=" * 80)
@@ -459,7 +486,7 @@ def main():
 
     # Step 4: Save locally
     saver = DatasetSaver()
-    dataset_file = saver.save(records, version=args.version)
+    dataset_file = saver.save(records, version=args.version, pretty=args.pretty)
 
     # Step 5: Push to Datadog (optional)
     if args.push_to_datadog:
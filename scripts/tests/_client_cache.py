@@ -0,0 +1,37 @@
+"""Shared, memoized google-genai client factory for the test scripts.
+
+Building a client repeats credential discovery (ADC token exchange for
+Vertex AI) and opens a fresh connection pool, so each configuration is
+built once per run and reused. google.genai is imported on first use so
+``--help`` and early exits don't pay for loading it.
+
+Usage:
+    from _client_cache import get_client
+
+    vertex_client = get_client(True, project, location, None)
+    ai_client = get_client(False, None, None, api_key)
+"""
+
+import functools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai
+
+
+@functools.lru_cache(maxsize=4)
+def get_client(
+    vertexai: bool,
+    project: str | None,
+    location: str | None,
+    api_key: str | None,
+) -> "genai.Client":
+    """Return a cached genai.Client for the given backend configuration."""
+    from google import genai
+
+    return genai.Client(
+        vertexai=vertexai,
+        project=project,
+        location=location,
+        api_key=api_key,
+    )
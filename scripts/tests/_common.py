@@ -0,0 +1,58 @@
+"""Output helpers shared by the test scripts.
+
+debug_models_api.py, test_gemini_models_api.py and test_both_sdk_approaches.py
+all print the same per-model details; keeping that loop here means a change
+to the listing is made once. The section rules every script prints are
+defined here as well.
+
+Usage:
+    from _common import SEP70, print_models
+
+    generate_models, embed_models = print_models(models, emit=print, limit=10)
+"""
+
+# Section rules, built once instead of on every print
+SEP60 = "=" * 60
+SEP60D = "-" * 60
+SEP70 = "=" * 70
+SEP70D = "-" * 70
+
+
+def print_models(models: list, emit=print, limit: int | None = None) -> tuple[list, list]:
+    """
+    Print each model's name, IDs, supported actions and token limits.
+
+    Args:
+        models: Models returned by client.models.list()
+        emit: print-compatible callable the lines are written to
+        limit: Only print the first ``limit`` models (all models are bucketed)
+
+    Returns:
+        (generate_models, embed_models): models supporting generateContent and
+        embedContent, collected in the same pass
+    """
+    generate_models = []
+    embed_models = []
+
+    for i, m in enumerate(models, 1):
+        if limit is None or i <= limit:
+            emit(f"\n  {i}. {m.name}")
+            emit(f"     Display: {m.display_name if hasattr(m, 'display_name') else 'N/A'}")
+            emit(f"     Base ID: {m.base_model_id if hasattr(m, 'base_model_id') else 'N/A'}")
+            if hasattr(m, "supported_actions"):
+                emit(f"     Actions: {m.supported_actions}")
+            if hasattr(m, "input_token_limit"):
+                emit(f"     Input Tokens: {m.input_token_limit}")
+            if hasattr(m, "output_token_limit"):
+                emit(f"     Output Tokens: {m.output_token_limit}")
+
+        actions = getattr(m, "supported_actions", None) or []
+        if "generateContent" in actions:
+            generate_models.append(m)
+        if "embedContent" in actions:
+            embed_models.append(m)
+
+    if limit is not None and len(models) > limit:
+        emit(f"\n  ... and {len(models) - limit} more models")
+
+    return generate_models, embed_models
@@ -0,0 +1,20 @@
+"""Environment shared by the test scripts.
+
+Loads ``.env`` next to these scripts once at import and exposes the
+settings they all read, so each script doesn't repeat the lookup.
+
+Usage:
+    from _env import API_KEY, LOCATION, PROJECT
+"""
+
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).parent / ".env"
+load_dotenv(ENV_PATH)
+
+PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
+LOCATION = os.getenv("VERTEX_AI_LOCATION", "us-central1")
+API_KEY = os.getenv("GEMINI_API_KEY")
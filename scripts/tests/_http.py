@@ -0,0 +1,31 @@
+"""Shared HTTP client for the REST probe scripts.
+
+One httpx.Client keeps the TLS connection to generativelanguage.googleapis.com
+alive, so every call after the first skips the handshake. ``loads`` parses
+response bodies with orjson when it is installed and falls back to the
+stdlib json module otherwise.
+
+Usage:
+    from _http import SESSION, loads
+
+    response = SESSION.get(url, params={"key": API_KEY})
+    data = loads(response.content)
+"""
+
+import atexit
+
+import httpx
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+# Connection failures are retried by the transport; HTTP status codes are
+# reported as-is so the probes show what the API actually returned
+SESSION = httpx.Client(
+    timeout=10.0,
+    headers={"User-Agent": "genai-tests/1.0"},
+    transport=httpx.HTTPTransport(retries=2),
+)
+atexit.register(SESSION.close)
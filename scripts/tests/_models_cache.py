@@ -0,0 +1,61 @@
+"""On-disk cache of client.models.list() results for the test scripts.
+
+The model catalog changes on the order of weeks, so repeated debugging runs
+can read it from disk instead of calling the Models API every time. Entries
+are keyed by backend, project, location and a hash of the API key, and
+expire after ``ttl`` seconds. Pass ``use_cache=False`` (the scripts'
+``--no-cache`` flag) to always hit the live API.
+
+Usage:
+    from _models_cache import cached_list_models
+
+    models = cached_list_models(client, use_cache=not args.no_cache)
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from _retry import list_models
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+CACHE_DIR = Path.home() / ".cache" / "genai-tests"
+
+
+def _cache_path(client) -> Path:
+    """Cache file for the client's backend configuration."""
+    api_client = client._api_client
+    api_key_hash = hashlib.sha256((api_client.api_key or "").encode()).hexdigest()
+    key = "|".join(
+        str(part)
+        for part in (api_client.vertexai, api_client.project, api_client.location, api_key_hash)
+    )
+    return CACHE_DIR / f"models-{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+def cached_list_models(
+    client, ttl: float = 3600, use_cache: bool = True, emit=print
+) -> "list[types.Model]":
+    """
+    Return list(client.models.list()), served from disk when fresh.
+
+    The cache-hit notice goes to ``emit``, a print-compatible callable, so
+    scripts that buffer their output keep it in the right section.
+    """
+    path = _cache_path(client)
+
+    if use_cache and path.exists() and time.time() - path.stat().st_mtime < ttl:
+        from google.genai import types
+
+        emit(f"(using cached model list from {path}, pass --no-cache to refresh)")
+        return [types.Model.model_validate(m) for m in json.loads(path.read_text())]
+
+    models = list_models(client)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps([m.model_dump(mode="json", exclude_none=True) for m in models]))
+    return models
@@ -0,0 +1,53 @@
+"""Retry transient Gemini API failures in the test scripts.
+
+A single 5xx, 429 or timeout from the Models API would otherwise abort a
+whole run. The wrappers below retry those with exponential backoff and
+re-raise the original error once attempts run out. tenacity is installed
+with google-genai.
+
+Usage:
+    from _retry import get_model, list_models
+
+    models = list_models(client)
+"""
+
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Server errors, rate limiting and timeouts are worth retrying."""
+    # Imported here so importing this module doesn't load google.genai
+    from google.genai import errors
+
+    if isinstance(exc, errors.ServerError):
+        return True
+    if isinstance(exc, errors.ClientError):
+        return exc.code == 429
+    return isinstance(exc, (httpx.TimeoutException, TimeoutError))
+
+
+resilient = retry(
+    wait=wait_exponential(multiplier=0.5, max=8),
+    stop=stop_after_attempt(4),
+    retry=retry_if_exception(_is_transient),
+    reraise=True,
+)
+
+
+@resilient
+def list_models(client) -> list:
+    """list(client.models.list()), retried on transient failures."""
+    return list(client.models.list())
+
+
+@resilient
+def get_model(client, model: str):
+    """client.models.get(model=...), retried on transient failures."""
+    return client.models.get(model=model)
+
+
+@resilient
+def generate_content(client, model: str, contents):
+    """client.models.generate_content(...), retried on transient failures."""
+    return client.models.generate_content(model=model, contents=contents)
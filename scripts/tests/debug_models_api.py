@@ -1,69 +1,70 @@
 #!/usr/bin/env python3
 """Debug script to investigate why models.list() returns empty."""
 
-import os
-from google import genai
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
-project = os.getenv("GOOGLE_CLOUD_PROJECT")
-location = os.getenv("VERTEX_AI_LOCATION", "us-central1")
+from _client_cache import get_client
+from _common import SEP60, SEP60D, print_models
+from _env import API_KEY, LOCATION, PROJECT
+from _models_cache import cached_list_models
+from _retry import get_model
 
-print("=" * 60)
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("genai_tests")
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--no-cache", action="store_true", help="Always call the live Models API")
+args = parser.parse_args()
+
+print(SEP60)
 print("Debugging Models API")
-print("=" * 60)
-print(f"Project: {project}")
-print(f"Location: {location}\n")
+print(SEP60)
+print(f"Project: {PROJECT}")
+print(f"Location: {LOCATION}\n")
 
 # Test 1: Vertex AI - List ALL models (no filter)
 print("Test 1: Vertex AI client.models.list() - ALL models")
-print("-" * 60)
+print(SEP60D)
+vertex_by_id = {}  # Reused by Test 3 so listed models aren't fetched again
 try:
-    client_vertex = genai.Client(
-        vertexai=True,
-        project=project,
-        location=location
-    )
+    client_vertex = get_client(True, PROJECT, LOCATION, None)
 
     print("Calling client.models.list()...")
-    models_list = list(client_vertex.models.list())
+    models_list = cached_list_models(client_vertex, use_cache=not args.no_cache)
     print(f"Number of models returned: {len(models_list)}")
+    vertex_by_id = {
+        getattr(m, 'base_model_id', None) or m.name.rsplit('/', 1)[-1]: m for m in models_list
+    }
 
     if models_list:
         print("\n📋 All models:")
-        for i, m in enumerate(models_list, 1):
-            print(f"\n  {i}. {m.name}")
-            print(f"     Display: {m.display_name if hasattr(m, 'display_name') else 'N/A'}")
-            print(f"     Base ID: {m.base_model_id if hasattr(m, 'base_model_id') else 'N/A'}")
-            if hasattr(m, 'supported_actions'):
-                print(f"     Actions: {m.supported_actions}")
-            if hasattr(m, 'input_token_limit'):
-                print(f"     Input Tokens: {m.input_token_limit}")
-            if hasattr(m, 'output_token_limit'):
-                print(f"     Output Tokens: {m.output_token_limit}")
+        print_models(models_list)
     else:
         print("  ❌ No models returned (empty list)")
 
         # Try to list what's available
         print("\n  Trying to get specific model info...")
         try:
-            model_info = client_vertex.models.get(model="gemini-2.5-flash")
+            model_info = get_model(client_vertex, "gemini-2.5-flash")
             print(f"  ✅ gemini-2.5-flash exists: {model_info.name}")
         except Exception as e:
             print(f"  ❌ Error getting gemini-2.5-flash: {e}")
 
 except Exception as e:
-    print(f"❌ Error: {e}")
-    import traceback
-    traceback.print_exc()
+    log.exception("❌ Error: %s", e)
 
-print("\n" + "=" * 60)
+print("\n" + SEP60)
 print("Test 2: Google AI API (if GEMINI_API_KEY set)")
-print("-" * 60)
+print(SEP60D)
 
-if os.getenv("GEMINI_API_KEY"):
+if API_KEY:
     try:
-        client_ai = genai.Client()  # Uses GEMINI_API_KEY
+        client_ai = get_client(False, None, None, API_KEY)
 
-        models_list = list(client_ai.models.list())
+        models_list = cached_list_models(client_ai, use_cache=not args.no_cache)
         print(f"Number of models: {len(models_list)}")
 
         if models_list:
@@ -76,9 +77,9 @@ if os.getenv("GEMINI_API_KEY"):
 else:
     print("  GEMINI_API_KEY not set, skipping")
 
-print("\n" + "=" * 60)
+print("\n" + SEP60)
 print("Test 3: Direct model access (Vertex AI)")
-print("-" * 60)
+print(SEP60D)
 
 # Try to use a known model directly without listing
 known_models = [
@@ -88,23 +89,30 @@ known_models = [
     "gemini-1.5-pro-002"
 ]
 
-client_vertex = genai.Client(
-    vertexai=True,
-    project=project,
-    location=location
-)
+client_vertex = get_client(True, PROJECT, LOCATION, None)
+
+# Only look up models Test 1 didn't already list, concurrently on the shared
+# client, and report in list order
+misses = [name for name in known_models if name not in vertex_by_id]
+futures = {}
+if misses:
+    with ThreadPoolExecutor(max_workers=len(misses)) as executor:
+        futures = {
+            model_name: executor.submit(get_model, client_vertex, model_name)
+            for model_name in misses
+        }
 
 for model_name in known_models:
     try:
         # Try to get model info
-        model_info = client_vertex.models.get(model=model_name)
+        model_info = vertex_by_id.get(model_name) or futures[model_name].result()
         print(f"  ✅ {model_name}: {model_info.display_name if hasattr(model_info, 'display_name') else 'Available'}")
     except Exception as e:
         print(f"  ❌ {model_name}: {str(e)[:80]}")
 
-print("\n" + "=" * 60)
+print("\n" + SEP60)
 print("Conclusion")
-print("=" * 60)
+print(SEP60)
 print("""
 If Test 1 returns 0 models but Test 3 shows models are available:
   → models.list() may not work with Vertex AI
@@ -8,213 +8,273 @@ Approach 2: vertexai SDK (google-cloud-aiplatform)
 Expected Result: Both return empty for first-party Gemini models
 """
 
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-
-# Load .env file from project root
-env_path = Path(__file__).parent / '.env'
-load_dotenv(env_path)
-print(f"✅ Loaded environment from: {env_path}\n")
-
-project = os.getenv("GOOGLE_CLOUD_PROJECT")
-location = os.getenv("VERTEX_AI_LOCATION", "us-central1")
-
-print("=" * 70)
+import argparse
+import asyncio
+import functools
+import io
+
+from _common import SEP70, print_models
+from _env import API_KEY, ENV_PATH, LOCATION, PROJECT
+
+print(f"✅ Loaded environment from: {ENV_PATH}\n")
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument("--no-cache", action="store_true", help="Always call the live Models API")
+parser.add_argument(
+    "--include-known-empty",
+    action="store_true",
+    help="Also run Approaches 2 and 3 (google-cloud-aiplatform), which list no Gemini models",
+)
+args = parser.parse_args()
+
+print(SEP70)
 print("COMPARING TWO SDK APPROACHES")
-print("=" * 70)
-print(f"\nProject: {project}")
-print(f"Location: {location}\n")
+print(SEP70)
+print(f"\nProject: {PROJECT}")
+print(f"Location: {LOCATION}\n")
 
 # ============================================================================
 # Approach 1: google-genai with vertexai=True
 # ============================================================================
-print("=" * 70)
-print("Approach 1: google-genai SDK with vertexai=True")
-print("=" * 70)
-print("Package: google-genai")
-print("Method: genai.Client(vertexai=True).models.list()\n")
-
-try:
-    from google import genai
-
-    client = genai.Client(
-        vertexai=True,
-        project=project,
-        location=location
-    )
+def approach_1() -> str:
+    """Approach 1: google-genai with vertexai=True."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
 
-    print("Calling client.models.list()...")
-    models = list(client.models.list())
+    emit(SEP70)
+    emit("Approach 1: google-genai SDK with vertexai=True")
+    emit(SEP70)
+    emit("Package: google-genai")
+    emit("Method: genai.Client(vertexai=True).models.list()\n")
 
-    print(f"Result: {len(models)} models")
+    try:
+        from _client_cache import get_client
+        from _models_cache import cached_list_models
 
-    if models:
-        print("\nModels returned:")
-        for m in models:
-            print(f"  - {m.name}")
-    else:
-        print("❌ No models returned (empty list)")
+        client = get_client(True, PROJECT, LOCATION, None)
+
+        emit("Calling client.models.list()...")
+        models = cached_list_models(client, use_cache=not args.no_cache, emit=emit)
+
+        emit(f"Result: {len(models)} models")
+
+        if models:
+            emit("\nModels returned:")
+            print_models(models, emit=emit)
+        else:
+            emit("❌ No models returned (empty list)")
+
+    except Exception as e:
+        emit(f"❌ Error: {e}")
+
+    return out.getvalue()
 
-except Exception as e:
-    print(f"❌ Error: {e}")
 
 # ============================================================================
 # Approach 2: Vertex AI SDK (google-cloud-aiplatform)
 # ============================================================================
-print("\n" + "=" * 70)
-print("Approach 2: Vertex AI SDK")
-print("=" * 70)
-print("Package: google-cloud-aiplatform")
-print("Method: aiplatform.Model.list()\n")
+def approach_2() -> str:
+    """Approach 2: Vertex AI SDK (google-cloud-aiplatform)."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
+
+    emit("\n" + SEP70)
+    emit("Approach 2: Vertex AI SDK")
+    emit(SEP70)
+    emit("Package: google-cloud-aiplatform")
+    emit("Method: aiplatform.Model.list()\n")
+
+    # Known to return no Gemini models, and aiplatform.init is slow; opt in to run
+    if not args.include_known_empty:
+        emit("⏭️  Skipped (known empty for Gemini) - pass --include-known-empty to run")
+        return out.getvalue()
 
-try:
-    from google.cloud import aiplatform
+    try:
+        from google.cloud import aiplatform
 
-    aiplatform.init(project=project, location=location)
+        aiplatform.init(project=PROJECT, location=LOCATION)
 
-    print("Calling aiplatform.Model.list()...")
-    models = list(aiplatform.Model.list())
+        emit("Calling aiplatform.Model.list()...")
+        models = list(aiplatform.Model.list())
 
-    print(f"Result: {len(models)} models")
+        emit(f"Result: {len(models)} models")
 
-    if models:
-        print("\nModels returned:")
-        for m in models:
-            print(f"  - {m.display_name} ({m.name})")
-    else:
-        print("❌ No models returned (empty list)")
+        if models:
+            emit("\nModels returned:")
+            for m in models:
+                emit(f"  - {m.display_name} ({m.name})")
+        else:
+            emit("❌ No models returned (empty list)")
+
+    except ImportError:
+        emit("⚠️ google-cloud-aiplatform not installed")
+        emit("   Install: pip install google-cloud-aiplatform")
+    except Exception as e:
+        emit(f"❌ Error: {e}")
+
+    return out.getvalue()
 
-except ImportError:
-    print("⚠️ google-cloud-aiplatform not installed")
-    print("   Install: pip install google-cloud-aiplatform")
-except Exception as e:
-    print(f"❌ Error: {e}")
 
 # ============================================================================
 # Approach 3: Try vertexai.preview.generative_models
 # ============================================================================
-print("\n" + "=" * 70)
-print("Approach 3: vertexai.preview.generative_models")
-print("=" * 70)
-print("Package: google-cloud-aiplatform (vertexai submodule)")
-print("Method: Check if there's a list method\n")
-
-try:
-    import vertexai
-    from vertexai.preview import generative_models
-
-    vertexai.init(project=project, location=location)
-
-    print("Initialized vertexai")
-    print(f"Available in generative_models: {dir(generative_models)}\n")
-
-    # Check if there's a list_models or similar method
-    if hasattr(generative_models, 'list_models'):
-        print("Found list_models() method!")
-        models = generative_models.list_models()
-        print(f"Result: {len(models)} models")
-    elif hasattr(generative_models, 'get_model'):
-        print("Found get_model() method (for getting specific model)")
-        print("Trying to get gemini-2.5-flash...")
-        try:
-            model = generative_models.GenerativeModel("gemini-2.5-flash")
-            print(f"✅ Successfully loaded: {model}")
-        except Exception as e:
-            print(f"❌ Error: {e}")
-    else:
-        print("❌ No list_models() or get_model() method found")
-        print("   Available methods:", [m for m in dir(generative_models) if not m.startswith('_')])
+def approach_3() -> str:
+    """Approach 3: vertexai.preview.generative_models."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
+
+    emit("\n" + SEP70)
+    emit("Approach 3: vertexai.preview.generative_models")
+    emit(SEP70)
+    emit("Package: google-cloud-aiplatform (vertexai submodule)")
+    emit("Method: Check if there's a list method\n")
+
+    # Known to return no Gemini models, and aiplatform.init is slow; opt in to run
+    if not args.include_known_empty:
+        emit("⏭️  Skipped (known empty for Gemini) - pass --include-known-empty to run")
+        return out.getvalue()
+
+    try:
+        import vertexai
+        from vertexai.preview import generative_models
+
+        vertexai.init(project=PROJECT, location=LOCATION)
+
+        emit("Initialized vertexai")
+        emit(f"Available in generative_models: {dir(generative_models)}\n")
+
+        # Check if there's a list_models or similar method
+        if hasattr(generative_models, 'list_models'):
+            emit("Found list_models() method!")
+            models = generative_models.list_models()
+            emit(f"Result: {len(models)} models")
+        elif hasattr(generative_models, 'get_model'):
+            emit("Found get_model() method (for getting specific model)")
+            emit("Trying to get gemini-2.5-flash...")
+            try:
+                model = generative_models.GenerativeModel("gemini-2.5-flash")
+                emit(f"✅ Successfully loaded: {model}")
+            except Exception as e:
+                emit(f"❌ Error: {e}")
+        else:
+            emit("❌ No list_models() or get_model() method found")
+            emit("   Available methods:", [m for m in dir(generative_models) if not m.startswith('_')])
+
+    except ImportError as e:
+        emit(f"⚠️ Could not import vertexai: {e}")
+    except Exception as e:
+        emit(f"❌ Error: {e}")
+
+    return out.getvalue()
 
-except ImportError as e:
-    print(f"⚠️ Could not import vertexai: {e}")
-except Exception as e:
-    print(f"❌ Error: {e}")
 
 # ============================================================================
 # Approach 4: Google AI API (non-Vertex AI)
 # ============================================================================
-print("\n" + "=" * 70)
-print("Approach 4: Google AI API (without Vertex AI)")
-print("=" * 70)
-print("Package: google-genai")
-print("Method: genai.Client().models.list() [Uses GEMINI_API_KEY]\n")
-
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if gemini_api_key:
-    try:
-        from google import genai
+def approach_4() -> str:
+    """Approach 4: Google AI API (non-Vertex AI)."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
+
+    emit("\n" + SEP70)
+    emit("Approach 4: Google AI API (without Vertex AI)")
+    emit(SEP70)
+    emit("Package: google-genai")
+    emit("Method: genai.Client().models.list() [Uses GEMINI_API_KEY]\n")
+
+    if API_KEY:
+        try:
+            from _client_cache import get_client
+            from _models_cache import cached_list_models
 
-        # Initialize client WITHOUT vertexai=True (uses Google AI API)
-        # Pass api_key explicitly
-        client_ai = genai.Client(api_key=gemini_api_key)
+            # Initialize client WITHOUT vertexai=True (uses Google AI API)
+            # Pass api_key explicitly
+            client_ai = get_client(False, None, None, API_KEY)
 
-        print("Calling client.models.list() with Google AI API...")
-        models = list(client_ai.models.list())
+            emit("Calling client.models.list() with Google AI API...")
+            models = cached_list_models(client_ai, use_cache=not args.no_cache, emit=emit)
 
-        print(f"Result: {len(models)} models")
+            emit(f"Result: {len(models)} models")
 
-        if models:
-            print("\n✅ SUCCESS! Models returned:")
-            for i, m in enumerate(models[:10], 1):  # Show first 10
-                print(f"  {i}. {m.base_model_id if hasattr(m, 'base_model_id') else m.name}")
-                if hasattr(m, 'supported_actions'):
-                    print(f"     Actions: {m.supported_actions}")
+            if models:
+                emit("\n✅ SUCCESS! Models returned:")
+                generate_models, _ = print_models(models, emit=emit, limit=10)  # Show first 10
 
-            if len(models) > 10:
-                print(f"\n  ... and {len(models) - 10} more models")
+                emit(f"\n📊 Models supporting generateContent: {len(generate_models)}")
 
-            # Filter for generateContent
-            generate_models = [m for m in models if hasattr(m, 'supported_actions') and "generateContent" in m.supported_actions]
-            print(f"\n📊 Models supporting generateContent: {len(generate_models)}")
+            else:
+                emit("❌ No models returned (empty list)")
 
-        else:
-            print("❌ No models returned (empty list)")
+        except Exception as e:
+            emit(f"❌ Error: {e}")
+    else:
+        emit("⚠️ GEMINI_API_KEY not set in environment")
+        emit("   To test Google AI API:")
+        emit("   1. Get API key from: https://aistudio.google.com/apikey")
+        emit("   2. Set: export GEMINI_API_KEY=your-api-key")
+        emit("   3. Run this test again")
+
+    return out.getvalue()
 
-    except Exception as e:
-        print(f"❌ Error: {e}")
-else:
-    print("⚠️ GEMINI_API_KEY not set in environment")
-    print("   To test Google AI API:")
-    print("   1. Get API key from: https://aistudio.google.com/apikey")
-    print("   2. Set: export GEMINI_API_KEY=your-api-key")
-    print("   3. Run this test again")
 
 # ============================================================================
 # Test: But can we USE the models?
 # ============================================================================
-print("\n" + "=" * 70)
-print("IMPORTANT: Can we USE Gemini models despite empty list?")
-print("=" * 70)
-print("Testing if gemini-2.5-flash works for generation with Vertex AI...\n")
-
-try:
-    from google import genai
-
-    client = genai.Client(
-        vertexai=True,
-        project=project,
-        location=location
-    )
+def generation_check() -> str:
+    """Check that gemini-2.5-flash generates despite the empty list."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
 
-    print("Attempting generate_content with gemini-2.5-flash...")
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents="Respond with just 'OK'"
+    emit("\n" + SEP70)
+    emit("IMPORTANT: Can we USE Gemini models despite empty list?")
+    emit(SEP70)
+    emit("Testing if gemini-2.5-flash works for generation with Vertex AI...\n")
+
+    try:
+        from _client_cache import get_client
+        from _retry import generate_content
+
+        client = get_client(True, PROJECT, LOCATION, None)
+
+        emit("Attempting generate_content with gemini-2.5-flash...")
+        response = generate_content(
+            client,
+            model="gemini-2.5-flash",
+            contents="Respond with just 'OK'"
+        )
+
+        emit(f"✅ SUCCESS! Model works!")
+        emit(f"   Response: {response.text}")
+
+    except Exception as e:
+        emit(f"❌ Failed: {e}")
+
+    return out.getvalue()
+
+
+# ============================================================================
+# Run all approaches concurrently
+# ============================================================================
+async def run_approaches() -> list[str]:
+    """Run each approach in a worker thread; each returns its captured output."""
+    return await asyncio.gather(
+        *(
+            asyncio.to_thread(approach)
+            for approach in (approach_1, approach_2, approach_3, approach_4, generation_check)
+        )
     )
 
-    print(f"✅ SUCCESS! Model works!")
-    print(f"   Response: {response.text}")
 
-except Exception as e:
-    print(f"❌ Failed: {e}")
+# Print after all complete so each approach's output stays grouped
+for output in asyncio.run(run_approaches()):
+    print(output, end="")
 
 # ============================================================================
 # Conclusion
 # ============================================================================
-print("\n" + "=" * 70)
+print("\n" + SEP70)
 print("CONCLUSION")
-print("=" * 70)
+print(SEP70)
 print("""
 Based on testing:
 
@@ -236,6 +296,8 @@ Based on testing:
    - Can load GenerativeModel directly by name
    - Models work for generation ✅
 
+(Approaches 2 and 3 are skipped unless --include-known-empty is passed.)
+
 KEY FINDING:
 The Google AI API (genai.Client()) CAN list models!
 But our app uses Vertex AI for authentication/production.
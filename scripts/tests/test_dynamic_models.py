@@ -6,120 +6,148 @@ This script tests the dynamic model fetching functionality
 implemented in the backend.
 """
 
+import asyncio
+import functools
+import io
 import os
-from pathlib import Path
-from dotenv import load_dotenv
 import httpx
-import json
 
-# Load .env file
-env_path = Path(__file__).parent / '.env'
-load_dotenv(env_path)
-print(f"✅ Loaded environment from: {env_path}\n")
+from _common import SEP70
+from _env import API_KEY, ENV_PATH
+from _http import loads
 
-print("=" * 70)
+print(f"✅ Loaded environment from: {ENV_PATH}\n")
+
+print(SEP70)
 print("Testing Dynamic Model Listing")
-print("=" * 70)
+print(SEP70)
 
 # Check for API key
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
+if not API_KEY:
     print("\n❌ ERROR: GEMINI_API_KEY not set!")
     print("Please add GEMINI_API_KEY to your .env file")
     exit(1)
 
-print(f"\n✅ GEMINI_API_KEY is set (length: {len(api_key)})\n")
+print(f"\n✅ GEMINI_API_KEY is set (length: {len(API_KEY)})\n")
 
-# Test 1: Direct REST API call
-print("=" * 70)
-print("Test 1: Direct REST API Call")
-print("=" * 70)
+# Both probes run concurrently over one pooled client. Each writes its report
+# to a buffer, printed in order once both finish.
+async def fetch_rest(client: httpx.AsyncClient) -> tuple[str, bool]:
+    """Test 1: Direct REST API call. Returns the report and whether it passed."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
 
-try:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-    print(f"\nCalling: {url[:80]}...\n")
+    emit(SEP70)
+    emit("Test 1: Direct REST API Call")
+    emit(SEP70)
 
-    response = httpx.get(url, timeout=10.0)
-    response.raise_for_status()
+    try:
+        url = "https://generativelanguage.googleapis.com/v1beta/models"
+        emit(f"\nCalling: {url}\n")
 
-    data = response.json()
-    models = data.get("models", [])
+        response = await client.get(url, params={"key": API_KEY})
+        response.raise_for_status()
 
-    # Filter for Gemini models with generateContent support
-    gemini_models = []
-    for model in models:
-        model_name = model.get("name", "").replace("models/", "")
-        if model_name.startswith("gemini-"):
-            supported_methods = model.get("supportedGenerationMethods", [])
-            if "generateContent" in supported_methods:
-                gemini_models.append(model_name)
+        data = loads(response.content)
+        models = data.get("models", [])
 
-    print(f"✅ SUCCESS! Found {len(gemini_models)} Gemini models with generateContent support\n")
-    print("📋 Models:")
-    for i, model in enumerate(gemini_models[:10], 1):  # Show first 10
-        print(f"  {i}. {model}")
+        # Filter for Gemini models with generateContent support
+        gemini_models = [
+            model_name
+            for model in models
+            if (model_name := model.get("name", "").removeprefix("models/")).startswith("gemini-")
+            and "generateContent" in model.get("supportedGenerationMethods", ())
+        ]
 
-    if len(gemini_models) > 10:
-        print(f"  ... and {len(gemini_models) - 10} more")
+        emit(f"✅ SUCCESS! Found {len(gemini_models)} Gemini models with generateContent support\n")
+        emit("📋 Models:")
+        for i, model in enumerate(gemini_models[:10], 1):  # Show first 10
+            emit(f"  {i}. {model}")
 
-except httpx.TimeoutException:
-    print("❌ TIMEOUT: API request timed out")
-    exit(1)
-except httpx.HTTPStatusError as e:
-    print(f"❌ HTTP ERROR: {e.response.status_code}")
-    print(f"Response: {e.response.text}")
-    exit(1)
-except Exception as e:
-    print(f"❌ ERROR: {e}")
-    exit(1)
+        if len(gemini_models) > 10:
+            emit(f"  ... and {len(gemini_models) - 10} more")
+
+    except httpx.TimeoutException:
+        emit("❌ TIMEOUT: API request timed out")
+        return out.getvalue(), False
+    except httpx.HTTPStatusError as e:
+        emit(f"❌ HTTP ERROR: {e.response.status_code}")
+        emit(f"Response: {e.response.text}")
+        return out.getvalue(), False
+    except Exception as e:
+        emit(f"❌ ERROR: {e}")
+        return out.getvalue(), False
+
+    return out.getvalue(), True
+
+
+async def fetch_backend(client: httpx.AsyncClient) -> str:
+    """Test 2: Backend /models endpoint (if running)."""
+    out = io.StringIO()
+    emit = functools.partial(print, file=out)
 
-# Test 2: Test backend models endpoint (if running)
-print("\n" + "=" * 70)
-print("Test 2: Backend /models Endpoint (if running)")
-print("=" * 70)
+    emit("\n" + SEP70)
+    emit("Test 2: Backend /models Endpoint (if running)")
+    emit(SEP70)
 
-backend_url = os.getenv("API_BASE_URL", "http://localhost:8000")
-models_url = f"{backend_url}/api/v1/vote-extraction/models"
+    backend_url = os.getenv("API_BASE_URL", "http://localhost:8000")
+    models_url = f"{backend_url}/api/v1/vote-extraction/models"
 
-try:
-    print(f"\nCalling: {models_url}\n")
+    try:
+        emit(f"\nCalling: {models_url}\n")
 
-    response = httpx.get(models_url, timeout=10.0)
-    response.raise_for_status()
+        response = await client.get(models_url)
+        response.raise_for_status()
 
-    data = response.json()
-    providers = data.get("providers", [])
+        data = loads(response.content)
+        providers = data.get("providers", [])
 
-    for provider in providers:
-        if provider.get("name") == "vertex_ai":
-            models = provider.get("models", [])
-            dynamic = provider.get("dynamic_listing", False)
+        for provider in providers:
+            if provider.get("name") == "vertex_ai":
+                models = provider.get("models", [])
+                dynamic = provider.get("dynamic_listing", False)
 
-            print(f"✅ Backend returned {len(models)} Gemini models")
-            print(f"📊 Dynamic listing: {'ENABLED' if dynamic else 'DISABLED (using static fallback)'}\n")
+                emit(f"✅ Backend returned {len(models)} Gemini models")
+                emit(f"📊 Dynamic listing: {'ENABLED' if dynamic else 'DISABLED (using static fallback)'}\n")
 
-            print("📋 First 5 models:")
-            for i, model in enumerate(models[:5], 1):
-                print(f"  {i}. {model.get('name')} - {model.get('display_name')}")
+                emit("📋 First 5 models:")
+                for i, model in enumerate(models[:5], 1):
+                    emit(f"  {i}. {model.get('name')} - {model.get('display_name')}")
 
-            if len(models) > 5:
-                print(f"  ... and {len(models) - 5} more")
+                if len(models) > 5:
+                    emit(f"  ... and {len(models) - 5} more")
 
-            break
+                break
 
-except httpx.ConnectError:
-    print("⚠️  Backend not running locally")
-    print("   To test backend:")
-    print("   1. Run: docker-compose up -d")
-    print("   2. Wait for services to start")
-    print("   3. Run this script again")
+    except httpx.ConnectError:
+        emit("⚠️  Backend not running locally")
+        emit("   To test backend:")
+        emit("   1. Run: docker-compose up -d")
+        emit("   2. Wait for services to start")
+        emit("   3. Run this script again")
 
-except Exception as e:
-    print(f"⚠️  Could not connect to backend: {e}")
+    except Exception as e:
+        emit(f"⚠️  Could not connect to backend: {e}")
+
+    return out.getvalue()
+
+
+async def run_probes() -> tuple[tuple[str, bool], str]:
+    """Run both probes concurrently over one pooled client."""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        return await asyncio.gather(fetch_rest(client), fetch_backend(client))
+
+
+(rest_report, rest_ok), backend_report = asyncio.run(run_probes())
+
+print(rest_report, end="")
+if not rest_ok:
+    exit(1)
+print(backend_report, end="")
 
-print("\n" + "=" * 70)
+print("\n" + SEP70)
 print("SUMMARY")
-print("=" * 70)
+print(SEP70)
 
 print("""
 ✅ Dynamic model listing is working!
@@ -15,22 +15,45 @@ Usage:
     poetry run python ../../test_gemini_models_api.py
 """
 
-import os
+import argparse
+import functools
+import io
+import logging
 import sys
-from google import genai
 
-print("=" * 60)
+from _client_cache import get_client
+from _common import SEP60, print_models
+from _env import LOCATION, PROJECT
+from _models_cache import cached_list_models
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("genai_tests")
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--no-cache", action="store_true", help="Always call the live Models API")
+args = parser.parse_args()
+
+# Per-model lines are buffered and written to stdout once per section
+buf = io.StringIO()
+emit = functools.partial(print, file=buf)
+
+
+def flush() -> None:
+    """Write the buffered lines to stdout in one call."""
+    sys.stdout.write(buf.getvalue())
+    buf.seek(0)
+    buf.truncate()
+
+
+print(SEP60)
 print("Testing Gemini Models API with Vertex AI")
-print("=" * 60)
+print(SEP60)
 
 # Get Vertex AI configuration from environment
-project = os.getenv("GOOGLE_CLOUD_PROJECT")
-location = os.getenv("VERTEX_AI_LOCATION", "us-central1")
-
-print(f"Project: {project}")
-print(f"Location: {location}")
+print(f"Project: {PROJECT}")
+print(f"Location: {LOCATION}")
 
-if not project:
+if not PROJECT:
     print("\n❌ ERROR: GOOGLE_CLOUD_PROJECT environment variable not set!")
     print("Please set it in your .env file or export it:")
     print("  export GOOGLE_CLOUD_PROJECT=your-project-id")
@@ -41,60 +64,40 @@ print()
 try:
     # Initialize client with Vertex AI backend
     # This is the same configuration used in vote_extraction_service.py
-    client = genai.Client(
-        vertexai=True,
-        project=project,
-        location=location
-    )
+    client = get_client(True, PROJECT, LOCATION, None)
     print("✅ Client initialized successfully with Vertex AI\n")
 
     # Alternative: Use Google AI API instead of Vertex AI
     # client = genai.Client()  # Uses GEMINI_API_KEY env var
 
     print("Listing ALL models (no filter):\n")
-    all_models = []
-    for m in client.models.list():
-        all_models.append(m)
-        print(f"  - {m.name}")
-        print(f"    Display: {m.display_name if hasattr(m, 'display_name') else 'N/A'}")
-        print(f"    Base ID: {m.base_model_id if hasattr(m, 'base_model_id') else 'N/A'}")
-        if hasattr(m, 'supported_actions'):
-            print(f"    Actions: {m.supported_actions}")
-        if hasattr(m, 'input_token_limit'):
-            print(f"    Input Tokens: {m.input_token_limit}")
-        if hasattr(m, 'output_token_limit'):
-            print(f"    Output Tokens: {m.output_token_limit}")
-        print()
+    all_models = cached_list_models(client, use_cache=not args.no_cache)
+    generate_models, embed_models = print_models(all_models, emit=emit)
+    flush()
 
     print(f"\nTotal models returned: {len(all_models)}")
 
     # Now filter by generateContent
-    print("\n" + "=" * 60)
+    print("\n" + SEP60)
     print("Filtering for models that support generateContent:\n")
-    generate_models = []
-    for m in all_models:
-        if hasattr(m, 'supported_actions') and "generateContent" in m.supported_actions:
-            print(f"  - {m.base_model_id if hasattr(m, 'base_model_id') else m.name}")
-            generate_models.append(m)
+    for m in generate_models:
+        emit(f"  - {m.base_model_id if hasattr(m, 'base_model_id') else m.name}")
+    flush()
 
     print(f"\nTotal models supporting generateContent: {len(generate_models)}")
 
-    print("\n" + "=" * 60)
+    print("\n" + SEP60)
     print("Filtering for models that support embedContent:\n")
-    embed_models = []
-    for m in all_models:
-        if hasattr(m, 'supported_actions') and "embedContent" in m.supported_actions:
-            print(f"  - {m.base_model_id if hasattr(m, 'base_model_id') else m.name}")
-            embed_models.append(m)
+    for m in embed_models:
+        emit(f"  - {m.base_model_id if hasattr(m, 'base_model_id') else m.name}")
+    flush()
 
     print(f"\nTotal models supporting embedContent: {len(embed_models)}")
 
 except Exception as e:
-    print(f"❌ Error: {e}")
-    print(f"Error type: {type(e).__name__}")
-    import traceback
-    traceback.print_exc()
+    flush()  # Show any lines buffered before the failure
+    log.exception("❌ Error: %s\nError type: %s", e, type(e).__name__)
 
-print("\n" + "=" * 60)
+print("\n" + SEP60)
 print("Test completed")
-print("=" * 60)
+print(SEP60)
@@ -11,23 +11,45 @@ Setup:
 3. Run: python test_google_ai_api.py
 """
 
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
+import argparse
+import functools
+import io
+import logging
+import sys
 
-# Load .env file from project root
-env_path = Path(__file__).parent / '.env'
-load_dotenv(env_path)
-print(f"✅ Loaded environment from: {env_path}\n")
+from _client_cache import get_client
+from _common import SEP70, SEP70D
+from _env import API_KEY, ENV_PATH
+from _models_cache import cached_list_models
+from _retry import generate_content
 
-print("=" * 70)
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("genai_tests")
+
+print(f"✅ Loaded environment from: {ENV_PATH}\n")
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument("--no-cache", action="store_true", help="Always call the live Models API")
+args = parser.parse_args()
+
+# Per-model lines are buffered and written to stdout once per section
+buf = io.StringIO()
+emit = functools.partial(print, file=buf)
+
+
+def flush() -> None:
+    """Write the buffered lines to stdout in one call."""
+    sys.stdout.write(buf.getvalue())
+    buf.seek(0)
+    buf.truncate()
+
+
+print(SEP70)
 print("Testing Google AI API (Non-Vertex AI)")
-print("=" * 70)
+print(SEP70)
 
 # Check for API key
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
+if not API_KEY:
     print("\n❌ ERROR: GEMINI_API_KEY environment variable not set!")
     print("\nTo use Google AI API:")
     print("  1. Visit: https://aistudio.google.com/apikey")
@@ -36,7 +58,7 @@ if not api_key:
     print("  4. Run this script again")
     exit(1)
 
-print(f"\n✅ GEMINI_API_KEY is set (length: {len(api_key)})")
+print(f"\n✅ GEMINI_API_KEY is set (length: {len(API_KEY)})")
 print()
 
 # ============================================================================
@@ -48,7 +70,7 @@ print("(This uses GEMINI_API_KEY, not GCP project auth)\n")
 try:
     # Initialize WITHOUT vertexai=True
     # Pass api_key explicitly
-    client = genai.Client(api_key=api_key)
+    client = get_client(False, None, None, API_KEY)
     print("✅ Client initialized successfully\n")
 
 except Exception as e:
@@ -58,77 +80,78 @@ except Exception as e:
 # ============================================================================
 # List All Models
 # ============================================================================
-print("=" * 70)
+print(SEP70)
 print("Listing ALL models from Google AI API")
-print("=" * 70)
+print(SEP70)
 
 try:
     print("\nCalling client.models.list()...\n")
 
-    all_models = []
-    for model in client.models.list():
-        all_models.append(model)
+    all_models = cached_list_models(client, use_cache=not args.no_cache)
 
     print(f"✅ SUCCESS! Found {len(all_models)} models\n")
 
     # Display all models
     print("📋 All Available Models:")
-    print("-" * 70)
+    print(SEP70D)
 
+    generate_models = []
+    embed_models = []
     for i, m in enumerate(all_models, 1):
-        print(f"\n{i}. {m.base_model_id}")
-        print(f"   Display Name: {m.display_name}")
+        emit(f"\n{i}. {m.base_model_id}")
+        emit(f"   Display Name: {m.display_name}")
         if hasattr(m, 'description') and m.description:
             desc = m.description[:100] + "..." if len(m.description) > 100 else m.description
-            print(f"   Description: {desc}")
+            emit(f"   Description: {desc}")
         if hasattr(m, 'supported_actions'):
-            print(f"   Supported Actions: {', '.join(m.supported_actions)}")
+            emit(f"   Supported Actions: {', '.join(m.supported_actions)}")
         if hasattr(m, 'input_token_limit'):
-            print(f"   Input Token Limit: {m.input_token_limit:,}")
+            emit(f"   Input Token Limit: {m.input_token_limit:,}")
         if hasattr(m, 'output_token_limit'):
-            print(f"   Output Token Limit: {m.output_token_limit:,}")
+            emit(f"   Output Token Limit: {m.output_token_limit:,}")
+
+        # Bucket by supported action in the same pass
+        actions = getattr(m, 'supported_actions', None) or []
+        if "generateContent" in actions:
+            generate_models.append(m)
+        if "embedContent" in actions:
+            embed_models.append(m)
+    flush()
 
     # ========================================================================
     # Filter by Action Type
     # ========================================================================
-    print("\n" + "=" * 70)
+    print("\n" + SEP70)
     print("Models Supporting 'generateContent'")
-    print("=" * 70)
-
-    generate_models = [
-        m for m in all_models
-        if hasattr(m, 'supported_actions') and "generateContent" in m.supported_actions
-    ]
+    print(SEP70)
 
     print(f"\n✅ {len(generate_models)} models support text generation:\n")
     for m in generate_models:
-        print(f"  - {m.base_model_id}")
+        emit(f"  - {m.base_model_id}")
+    flush()
 
     # ========================================================================
     # Filter for Embedding Models
     # ========================================================================
-    print("\n" + "=" * 70)
+    print("\n" + SEP70)
     print("Models Supporting 'embedContent'")
-    print("=" * 70)
-
-    embed_models = [
-        m for m in all_models
-        if hasattr(m, 'supported_actions') and "embedContent" in m.supported_actions
-    ]
+    print(SEP70)
 
     print(f"\n✅ {len(embed_models)} models support embeddings:\n")
     for m in embed_models:
-        print(f"  - {m.base_model_id}")
+        emit(f"  - {m.base_model_id}")
+    flush()
 
     # ========================================================================
     # Test Generation with a Model
     # ========================================================================
-    print("\n" + "=" * 70)
+    print("\n" + SEP70)
     print("Testing Generation with gemini-2.5-flash")
-    print("=" * 70)
+    print(SEP70)
 
     try:
-        response = client.models.generate_content(
+        response = generate_content(
+            client,
             model="gemini-2.5-flash",
             contents="Say 'Hello from Google AI API' if you can see this."
         )
@@ -138,16 +161,15 @@ try:
         print(f"\n❌ Generation failed: {e}\n")
 
 except Exception as e:
-    print(f"❌ Error listing models: {e}")
-    import traceback
-    traceback.print_exc()
+    flush()  # Show any lines buffered before the failure
+    log.exception("❌ Error listing models: %s", e)
 
 # ============================================================================
 # Summary
 # ============================================================================
-print("\n" + "=" * 70)
+print("\n" + SEP70)
 print("SUMMARY")
-print("=" * 70)
+print(SEP70)
 print("""
 ✅ Google AI API CAN list Gemini models!
 
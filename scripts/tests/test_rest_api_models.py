@@ -6,53 +6,55 @@ Uses the direct REST API endpoint instead of the Python SDK.
 Reference: https://ai.google.dev/api/rest/generativelanguage/models/list
 """
 
-import os
-import requests
-from pathlib import Path
-from dotenv import load_dotenv
+import logging
 
-# Load .env file from project root
-env_path = Path(__file__).parent / '.env'
-load_dotenv(env_path)
-print(f"✅ Loaded environment from: {env_path}\n")
+import httpx
 
-print("=" * 70)
+from _common import SEP70, SEP70D
+from _env import API_KEY, ENV_PATH
+from _http import SESSION, loads
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+log = logging.getLogger("genai_tests")
+
+print(f"✅ Loaded environment from: {ENV_PATH}\n")
+
+print(SEP70)
 print("Testing Gemini REST API for Model Listing")
-print("=" * 70)
+print(SEP70)
 
 # Check for API key
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
+if not API_KEY:
     print("\n❌ ERROR: GEMINI_API_KEY not set!")
     exit(1)
 
-print(f"\n✅ GEMINI_API_KEY is set (length: {len(api_key)})\n")
+print(f"\n✅ GEMINI_API_KEY is set (length: {len(API_KEY)})\n")
 
 # ============================================================================
 # Method 1: List models via REST API
 # ============================================================================
-print("=" * 70)
+print(SEP70)
 print("Method 1: REST API - /v1beta/models")
-print("=" * 70)
+print(SEP70)
 
-url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
+url = "https://generativelanguage.googleapis.com/v1beta/models"
 
-print(f"\nCalling: {url[:80]}...\n")
+print(f"\nCalling: {url}\n")
 
 try:
-    response = requests.get(url, timeout=10)
+    response = SESSION.get(url, params={"key": API_KEY})
 
     print(f"Status Code: {response.status_code}")
 
     if response.status_code == 200:
-        data = response.json()
+        data = loads(response.content)
         models = data.get('models', [])
 
         print(f"✅ SUCCESS! Found {len(models)} models\n")
 
         if models:
             print("📋 Available Models:")
-            print("-" * 70)
+            print(SEP70D)
 
             for i, model in enumerate(models, 1):
                 name = model.get('name', 'Unknown')
@@ -81,9 +83,9 @@ try:
             # ================================================================
             # Filter by generation method
             # ================================================================
-            print("\n" + "=" * 70)
+            print("\n" + SEP70)
             print("Models Supporting 'generateContent'")
-            print("=" * 70)
+            print(SEP70)
 
             generate_models = [
                 m for m in models
@@ -98,9 +100,9 @@ try:
             # ================================================================
             # Filter by embedding method
             # ================================================================
-            print("\n" + "=" * 70)
+            print("\n" + SEP70)
             print("Models Supporting 'embedContent'")
-            print("=" * 70)
+            print(SEP70)
 
             embed_models = [
                 m for m in models
@@ -120,30 +122,28 @@ try:
         print(f"❌ Request failed!")
         print(f"Response: {response.text[:500]}")
 
-except requests.exceptions.Timeout:
+except httpx.TimeoutException:
     print("❌ Request timed out")
 except Exception as e:
-    print(f"❌ Error: {e}")
-    import traceback
-    traceback.print_exc()
+    log.exception("❌ Error: %s", e)
 
 # ============================================================================
 # Method 2: Get specific model details
 # ============================================================================
-print("\n" + "=" * 70)
+print("\n" + SEP70)
 print("Method 2: REST API - Get Specific Model Info")
-print("=" * 70)
+print(SEP70)
 
 model_name = "models/gemini-2.5-flash"
-url = f"https://generativelanguage.googleapis.com/v1beta/{model_name}?key={api_key}"
+url = f"https://generativelanguage.googleapis.com/v1beta/{model_name}"
 
-print(f"\nCalling: {url[:80]}...\n")
+print(f"\nCalling: {url}\n")
 
 try:
-    response = requests.get(url, timeout=10)
+    response = SESSION.get(url, params={"key": API_KEY})
 
     if response.status_code == 200:
-        model = response.json()
+        model = loads(response.content)
         print(f"✅ Model found: {model.get('displayName')}")
         print(f"\nDetails:")
         print(f"  Name: {model.get('name')}")
@@ -165,9 +165,9 @@ except Exception as e:
 # ============================================================================
 # Summary
 # ============================================================================
-print("\n" + "=" * 70)
+print("\n" + SEP70)
 print("SUMMARY")
-print("=" * 70)
+print(SEP70)
 print("""
 The REST API approach:
   - Direct HTTP calls to Google's API
@@ -9,6 +9,8 @@ Based on Google documentation:
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
+
 from google import genai
 
 project = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -61,17 +63,25 @@ known_gemini_models = [
     "gemini-1.5-pro-002"
 ]
 
-for model_id in known_gemini_models:
+
+def probe(model_id: str) -> str:
+    """Try a simple generation request and return the result line."""
     try:
-        # Try a simple generation request
         response = client.models.generate_content(
             model=model_id,
             contents="Say 'OK' if you can see this."
         )
-        print(f"  ✅ {model_id}: Works! Response: {response.text[:50]}")
+        return f"  ✅ {model_id}: Works! Response: {response.text[:50]}"
     except Exception as e:
         error_msg = str(e)[:80]
-        print(f"  ❌ {model_id}: {error_msg}")
+        return f"  ❌ {model_id}: {error_msg}"
+
+
+# The requests are independent, so run them concurrently on the shared client
+# and print the results in list order
+with ThreadPoolExecutor(max_workers=len(known_gemini_models)) as executor:
+    for line in executor.map(probe, known_gemini_models):
+        print(line)
 
 # ============================================================================
 # Test 3: Alternative - Use google-cloud-aiplatform
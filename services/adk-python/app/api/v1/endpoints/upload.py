@@ -73,6 +73,11 @@ async def upload_single_file(
                 f"documents (TXT, MD, PDF)",
             )
 
+        # Reject oversized uploads before reading them into memory; the multipart
+        # parser has already spooled the body and recorded its size
+        if file.size is not None:
+            _validate_file_size(file.size, file_type)
+
         # Read file content
         content = await file.read()
         file_size = len(content)